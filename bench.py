@@ -0,0 +1,272 @@
+"""Offline benchmarks for the screener's hot paths.
+
+    python bench.py                    # run everything, compare against bench_baseline.json
+    python bench.py -k smc             # only cases whose name contains "smc"
+    python bench.py --save-baseline    # store this run as the new baseline
+    python bench.py --quick            # fewer repeats, smaller universes
+    python bench.py --write-replay DIR # bar files for `main.py poll --replay DIR`
+
+All data comes from a seeded synthetic OHLCV generator, so no network access is needed
+and two runs on the same machine see identical inputs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import main
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+REGRESSION_TOLERANCE = 0.25  # Flag cases whose median is >25% slower than baseline
+
+# (label, interval, bars): 1y / 5y of daily and regular-hours hourly bars
+DATASETS = [
+    ("daily_1y", "1d", 252),
+    ("daily_5y", "1d", 252 * 5),
+    ("hourly_1y", "1h", 252 * 7),
+    ("hourly_5y", "1h", 252 * 7 * 5),
+]
+REGIMES = ["trend", "chop"]
+UNIVERSE_SIZES = [10, 25, 50]
+
+# ==================== Synthetic Data ====================
+def synthetic_ohlcv(bars, interval="1d", regime="trend", seed=0, start_price=100.0, market=None, beta=1.2):
+    """Seeded OHLCV frame shaped like yfinance output.
+
+    regime="trend" drifts upward (passes the screener's 200MA filter),
+    regime="chop" is mean-reverting around the start price.
+    market: optional array of market returns the series loads onto with `beta`.
+    """
+    rng = np.random.default_rng(seed)
+    sigma = 0.018 if interval == "1d" else 0.006
+
+    if regime == "trend":
+        returns = rng.normal(sigma * 0.1, sigma, bars)
+    else:
+        noise = rng.normal(0, sigma, bars)
+        returns = np.empty(bars)
+        level = 0.0
+        for i in range(bars):
+            returns[i] = noise[i] - 0.05 * level
+            level += returns[i]
+    if market is not None:
+        returns = returns * 0.5 + beta * market[-bars:]
+
+    close = start_price * np.exp(np.cumsum(returns))
+    prev_close = np.concatenate([[start_price], close[:-1]])
+    open_ = prev_close * (1 + rng.normal(0, sigma * 0.25, bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, sigma * 0.5, bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, sigma * 0.5, bars)))
+    # Volume spikes on large moves so order blocks / RVOL paths are exercised
+    volume = rng.lognormal(np.log(20_000_000), 0.35, bars) * (1 + 15 * np.abs(returns))
+
+    freq = "B" if interval == "1d" else ("W-FRI" if interval == "1wk" else "h")
+    index = pd.date_range(end=pd.Timestamp("2026-01-02 16:00"), periods=bars, freq=freq, tz="America/New_York")
+    return pd.DataFrame({
+        "Open": open_, "High": high, "Low": low, "Close": close,
+        "Volume": volume.astype("int64"), "Dividends": 0.0, "Stock Splits": 0.0,
+    }, index=index)
+
+def _market_returns(bars, interval):
+    sigma = 0.011 if interval == "1d" else 0.004
+    return np.random.default_rng(12345).normal(sigma * 0.08, sigma, bars)
+
+# ==================== Timing ====================
+def measure(fn, min_time=0.5, min_runs=3, max_runs=200):
+    """Call fn until min_time has elapsed (at least min_runs). Returns per-call seconds"""
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < min_runs or (time.perf_counter() - start < min_time and len(samples) < max_runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+def summarize(samples):
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "runs": len(samples)}
+
+# ==================== Function Cases ====================
+def function_cases(quick=False):
+    """Yield (name, callable, timing kwargs) for every hot function x dataset x regime"""
+    datasets = DATASETS[:3] if quick else DATASETS
+    for label, interval, bars in datasets:
+        for regime in REGIMES:
+            df = synthetic_ohlcv(bars, interval, regime, seed=bars)
+            mtf = (synthetic_ohlcv(400, "1h", regime, seed=1), synthetic_ohlcv(52, "1wk", regime, seed=2))
+            bsl, ssl, eq, entry, sl, found_fvg, sweep = main.calculate_smc_v2(df)
+            indicators = main.calculate_indicators(df)
+            key = f"{label}.{regime}"
+
+            yield f"zone_store.build.{key}", lambda df=df: main.ZoneStore("SYN").update(df), {}
+            yield f"detect_market_structure_break.{key}", lambda df=df: main.detect_market_structure_break(df), {}
+            yield f"calculate_smc_v2.{key}", lambda df=df: main.calculate_smc_v2(df), {}
+            yield f"calculate_indicators.{key}", lambda df=df: main.calculate_indicators(df), {}
+            # Poll-mode equivalent: revise the latest bar of an IndicatorState
+            state = main.IndicatorState.from_frame(df)
+            last = (state.last_ts, float(df['Close'].iloc[-1]), float(df['Volume'].iloc[-1]))
+            yield f"indicator_state.update.{key}", lambda st=state, last=last: st.update(*last), {}
+            yield (f"calculate_advanced_score.{key}",
+                   lambda df=df, e=entry, s=sl, tp=bsl, sw=sweep, ind=indicators, mtf=mtf, fvg=found_fvg:
+                       main.calculate_advanced_score("SYN", df, e, s, tp, 5, sw, ind, mtf, found_fvg=fvg), {})
+            # Same, with a ZoneStore that is already up to date (the steady state between runs)
+            zones = main.ZoneStore("SYN").update(df)
+            yield (f"calculate_advanced_score.warm_zones.{key}",
+                   lambda df=df, e=entry, s=sl, tp=bsl, sw=sweep, ind=indicators, mtf=mtf, z=zones, fvg=found_fvg:
+                       main.calculate_advanced_score("SYN", df, e, s, tp, 5, sw, ind, mtf, z, found_fvg=fvg), {})
+            yield (f"build_chart_payload.{key}",
+                   lambda df=df, e=entry, s=sl, tp=bsl, sw=sweep: main.build_chart_payload(df, "SYN", "Daily SMC", e, s, tp, False, sw), {})
+            # mplfinance is slow; a handful of runs is enough
+            yield (f"generate_chart.{key}",
+                   lambda df=df, e=entry, s=sl, tp=bsl, sw=sweep: main.generate_chart(df, "SYN", "Daily SMC", e, s, tp, False, sw),
+                   {"min_time": 0.0, "min_runs": 3 if not quick else 1})
+
+# ==================== Offline main() ====================
+class OfflineMarket:
+    """Replaces every network entry point in main with synthetic data for a given universe"""
+    def __init__(self, size):
+        self.tickers = [f"SYN{i:03d}" for i in range(size)]
+        self.market = {iv: _market_returns(n, iv) for iv, n in (("1d", 252), ("1h", 252 * 7), ("1wk", 52))}
+
+    def history(self, ticker, period, interval="1d"):
+        bars = {"1d": 252 if period != "6mo" else 126, "1h": 21 * 7 if period == "1mo" else 63 * 7, "1wk": 52}[interval]
+        seed = sum(map(ord, ticker)) * 31 + len(interval)
+        if ticker in ("SPY", "QQQ"):
+            return synthetic_ohlcv(bars, interval, "trend", seed=seed, market=self.market[interval], beta=1.0)
+        regime = "chop" if seed % 4 == 0 else "trend"
+        return synthetic_ohlcv(bars, interval, regime, seed=seed, market=self.market[interval])
+
+    def patch(self):
+        saved = {name: getattr(main, name) for name in
+                 ("yf_history", "get_stock_sector", "check_earnings", "get_polygon_news", "get_ticker_news", "send_discord_alert", "get_screen_universe")}
+        main.yf_history = self.history
+        main.get_stock_sector = lambda t: "🧪 Synthetic"
+        main.check_earnings = lambda t: ""
+        main.get_polygon_news = lambda: "<div>offline</div>"
+        main.get_ticker_news = lambda t: []
+        main.send_discord_alert = lambda results: None
+        main.get_screen_universe = lambda: list(self.tickers)
+        return saved
+
+def run_offline_main(size):
+    """Full main() on a synthetic universe inside a scratch directory"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    market = OfflineMarket(size)
+    saved = market.patch()
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="dailydip-bench-")
+    try:
+        shutil.copytree(os.path.join(repo, main.STATIC_DIR), os.path.join(workdir, main.STATIC_DIR))
+        os.chdir(workdir)
+        main.main()
+    finally:
+        os.chdir(cwd)
+        for name, fn in saved.items():
+            setattr(main, name, fn)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main_cases(quick=False):
+    sizes = UNIVERSE_SIZES[:2] if quick else UNIVERSE_SIZES
+    for size in sizes:
+        yield f"main.universe_{size}", lambda size=size: run_offline_main(size), {"min_time": 0.0, "min_runs": 1}
+
+# ==================== Replay Files ====================
+def write_replay(directory, size=10, days=3):
+    """<T>.1d.csv (a year of history) + <T>.1h.csv (`days` sessions after it) per synthetic ticker"""
+    os.makedirs(directory, exist_ok=True)
+    market = OfflineMarket(size)
+    for t in market.tickers:
+        daily = market.history(t, "1y", "1d")
+        seed = sum(map(ord, t))
+        hourly = synthetic_ohlcv(days * 7, "1h", "trend", seed=seed, start_price=float(daily['Close'].iloc[-1]))
+        sessions = pd.bdate_range(daily.index[-1].normalize().tz_localize(None) + pd.Timedelta(days=1), periods=days)
+        hourly.index = pd.DatetimeIndex([d + pd.Timedelta(hours=9, minutes=30) + pd.Timedelta(hours=h)
+                                         for d in sessions for h in range(7)]).tz_localize("America/New_York")
+        daily.to_csv(os.path.join(directory, f"{t}.1d.csv"))
+        hourly.to_csv(os.path.join(directory, f"{t}.1h.csv"))
+    print(f"✅ Replay bars for {size} tickers written to {directory}")
+
+# ==================== Baseline ====================
+def load_baseline():
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, "r") as f:
+        return json.load(f).get("results", {})
+
+def save_baseline(results):
+    with open(BASELINE_FILE, "w") as f:
+        json.dump({"saved": time.strftime('%Y-%m-%d %H:%M:%S'), "python": sys.version.split()[0],
+                   "results": results}, f, indent=2, sort_keys=True)
+    print(f"✅ Baseline saved to {BASELINE_FILE}")
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = res["median_s"] / base["median_s"] if base["median_s"] > 0 else 1.0
+        res["vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append((name, ratio))
+    return regressions
+
+# ==================== CLI ====================
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the screener's hot functions on synthetic data")
+    parser.add_argument("-k", dest="pattern", default="", help="only run cases whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="fewer datasets, repeats and universe sizes")
+    parser.add_argument("--no-main", action="store_true", help="skip the full offline main() runs")
+    parser.add_argument("--save-baseline", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--json", dest="json_out", help="also write results to this file")
+    parser.add_argument("--write-replay", metavar="DIR", help="write poll-mode replay bars to DIR and exit")
+    args = parser.parse_args(argv)
+    
+    if args.write_replay:
+        write_replay(args.write_replay)
+        return 0
+
+    cases = list(function_cases(args.quick))
+    if not args.no_main:
+        cases += list(main_cases(args.quick))
+    cases = [c for c in cases if args.pattern in c[0]]
+
+    results = {}
+    for name, fn, kwargs in cases:
+        if args.quick and "min_time" not in kwargs:
+            kwargs = dict(kwargs, min_time=0.1)
+        if name.startswith("main."):
+            print(f"⏱️  {name} ...")
+        res = summarize(measure(fn, **kwargs))
+        results[name] = res
+        print(f"{name:<55} {res['median_s'] * 1000:>10.2f} ms  (min {res['min_s'] * 1000:.2f} ms, {res['runs']} runs)")
+
+    baseline = load_baseline()
+    regressions = compare(results, baseline, args.tolerance)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        save_baseline(results)
+        return 0
+    if not baseline:
+        print("ℹ️ No baseline yet. Run with --save-baseline to create one.")
+        return 0
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for name, ratio in sorted(regressions, key=lambda x: -x[1]):
+            print(f"   {name}: {ratio:.2f}x baseline")
+        return 1
+    print(f"✅ No regressions beyond {args.tolerance:.0%} against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -1,25 +1,177 @@
 import os
-import matplotlib
-# 1. Force backend to avoid server-side errors
-matplotlib.use('Agg')
-import requests
-import yfinance as yf
-import mplfinance as mpf
-import pandas as pd
-import numpy as np
+import sys
+import argparse
+import asyncio
+import importlib
 import base64
+import bisect
+import cProfile
+import functools
+import pstats
+import threading
+import gzip
+import hashlib
 import json
+import math
+import re
 import time
 import random
 from io import BytesIO
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from string import Template
+from dataclasses import dataclass, asdict
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+try:
+    import brotli  # Optional: .br outputs for the static host
+except ImportError:
+    brotli = None
+
+class _LazyModule:
+    """Imports the real module on first attribute access, so commands only pay for what they use"""
+    def __init__(self, name, before=None):
+        self._name = name
+        self._before = before
+        self._mod = None
+
+    def __getattr__(self, attr):
+        if self._mod is None:
+            if self._before:
+                self._before()
+            self._mod = importlib.import_module(self._name)
+        return getattr(self._mod, attr)
+
+def _use_agg():
+    import matplotlib
+    # 1. Force backend to avoid server-side errors
+    matplotlib.use('Agg')
+
+requests = _LazyModule("requests")
+yf = _LazyModule("yfinance")
+pd = _LazyModule("pandas")
+np = _LazyModule("numpy")
+mpf = _LazyModule("mplfinance", before=_use_agg)
+plt = _LazyModule("matplotlib.pyplot", before=_use_agg)
+patches = _LazyModule("matplotlib.patches", before=_use_agg)
 
 # ==================== 0. Settings ====================
 API_KEY = os.environ.get("POLYGON_API_KEY", "") # Default to empty if not set
 DISCORD_WEBHOOK = os.environ.get("DISCORD_WEBHOOK_URL", "")
 HISTORY_FILE = "history.json"
+COMPACT_OHLCV = os.environ.get("COMPACT_OHLCV", "0") == "1"  # float32 prices, downcast volume, OHLCV columns only
+CHART_MODE = os.environ.get("CHART_MODE", "png")  # "png" = mplfinance images, "canvas" = static/chart.js
+POLYGON_BASE_URL = os.environ.get("POLYGON_BASE_URL", "https://api.polygon.io").rstrip("/")  # Point at a stub server for tests
+CACHE_DIR = ".cache"
+
+# ==================== 0b. Run Instrumentation ====================
+# Timing spans + counters for every stage and per-ticker sub-step, dumped to
+# run_report.json next to index.html. PROFILE_TICKER=XYZ adds a cProfile dump for one ticker.
+RUN_REPORT_FILE = "run_report.json"
+PROFILE_TICKER = os.environ.get("PROFILE_TICKER", "").upper()
+
+_METRICS_LOCK = threading.Lock()
+_TIMINGS = defaultdict(list)   # span name -> [seconds]
+_COUNTERS = defaultdict(int)   # counter name -> count
+_PROFILES = []
+_REJECTED = {}                 # ticker -> data-quality reasons
+
+@contextmanager
+def span(name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        with _METRICS_LOCK:
+            _TIMINGS[name].append(elapsed)
+
+def count(name, n=1):
+    with _METRICS_LOCK:
+        _COUNTERS[name] += n
+
+def record_rejection(ticker, reasons):
+    """A ticker dropped by the data-quality gate: reasons go to run_report.json"""
+    with _METRICS_LOCK:
+        _REJECTED[ticker] = list(reasons)
+    for reason in reasons:
+        count(f"quality.{reason.split(':')[0]}")
+
+def swallowed(where):
+    """Record an exception eaten by one of the bare `except:` fallbacks"""
+    count(f"swallowed.{where}")
+
+def timed(name):
+    """Decorator: record every call of the function under span `name`"""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def ticker_stage(name):
+    """Decorator for per-ticker stage functions f(ticker, ...): timing span + optional cProfile"""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(t, *args, **kwargs):
+            with span(name), profile_ticker(t):
+                return fn(t, *args, **kwargs)
+        return inner
+    return wrap
+
+@contextmanager
+def profile_ticker(ticker):
+    """cProfile the enclosed block when ticker == PROFILE_TICKER (works per thread, stages are merged)"""
+    if not PROFILE_TICKER or ticker != PROFILE_TICKER:
+        yield
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        with _METRICS_LOCK:
+            _PROFILES.append(prof)
+
+def _percentile(sorted_vals, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    return sorted_vals[max(0, math.ceil(pct / 100 * len(sorted_vals)) - 1)]
+
+def write_run_report(path=RUN_REPORT_FILE, started=None):
+    with _METRICS_LOCK:
+        timings = {k: sorted(v) for k, v in _TIMINGS.items()}
+        counters = dict(_COUNTERS)
+        profiles = list(_PROFILES)
+        rejected = dict(sorted(_REJECTED.items()))
+    
+    report = {
+        "generated": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "duration_s": round(time.time() - started, 3) if started else None,
+        "spans": {
+            name: {"count": len(v), "total_s": round(sum(v), 4), "p50_s": round(_percentile(v, 50), 4),
+                   "p95_s": round(_percentile(v, 95), 4), "max_s": round(v[-1], 4)}
+            for name, v in sorted(timings.items())
+        },
+        "counters": dict(sorted(counters.items())),
+        "rejected": rejected,
+    }
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✅ Run report written to {path}")
+    except Exception as e:
+        print(f"❌ Failed to write run report: {e}")
+    
+    if profiles:
+        stats = pstats.Stats(profiles[0])
+        for prof in profiles[1:]:
+            stats.add(prof)
+        stats.dump_stats(f"profile_{PROFILE_TICKER}.prof")
+        print(f"✅ cProfile dump written to profile_{PROFILE_TICKER}.prof")
 
 # ==================== 1. Stock Universe (V8 Optimized) ====================
 PRIORITY_TICKERS = ["TSLA", "AMZN", "NVDA", "AAPL", "MSFT", "GOOGL", "META", "AMD", "PLTR", "SOFI", "HOOD", "COIN", "MSTR", "TSM", "ASML", "ARM"]
@@ -59,6 +211,7 @@ def load_history():
             with open(HISTORY_FILE, "r") as f:
                 return json.load(f)
         except: 
+            swallowed("load_history")
             return {}
     return {}
 
@@ -67,67 +220,174 @@ def save_history(history):
         with open(HISTORY_FILE, "w") as f:
             json.dump(history, f, indent=4)
     except Exception as e:
+        swallowed("save_history")
         print(f"❌ Failed to save history: {e}")
 
-def generate_ticker_grid(picks, title, color_class="top-card"):
-    """Helper: Generate HTML grid for tickers"""
+def write_ticker_grid(out, picks, title, color_class="top-card"):
+    """Helper: Stream HTML grid for tickers"""
+    out.write(tpl('grid_title').substitute(title=title))
     if not picks:
-        return f"<h3 style='color:#fbbf24; margin-top:30px;'>{title}</h3><div style='color:#666; margin-bottom:20px; padding:10px; background:rgba(255,255,255,0.05); border-radius:8px;'>No Data Available</div>"
+        out.write(tpl('grid_empty').template)
+        return
     
-    html = f"<h3 style='color:#fbbf24; margin-top:30px;'>{title}</h3><div class='top-grid'>"
+    out.write("<div class='top-grid'>")
+    style = "border-color:#fbbf24;" if color_class == "top-card" else "border:1px solid #475569; background:rgba(30,41,59,0.5); opacity: 0.9;"
+    card = tpl('top_card')
     for p in picks:
-        ticker = p.get('ticker')
         score = p.get('score', 0)
-        sector = p.get('sector', '')
-        
-        style = "border-color:#fbbf24;" if color_class == "top-card" else "border:1px solid #475569; background:rgba(30,41,59,0.5); opacity: 0.9;"
-        
-        html += f"<div class='card {color_class}' onclick=\"openModal('{ticker}')\" style='{style}'>" \
-                f"<div style='font-size:1.2rem;margin-bottom:5px'><b>{ticker}</b></div>" \
-                f"<div style='color:{'#10b981' if score >= 80 else '#94a3b8'};font-weight:bold'>{score}</div>" \
-                f"<div style='font-size:0.7rem;color:#888'>{sector}</div></div>"
-    html += "</div>"
-    return html
+        out.write(card.substitute(
+            color_class=color_class, style=style, ticker=p.get('ticker'), score=score,
+            score_color='#10b981' if score >= 80 else '#94a3b8', sector=p.get('sector', '')))
+    out.write("</div>")
 
 # ==================== 3. Core: Order Block Identification ====================
-def identify_order_blocks(df, lookback=30):
-    """Identify Order Blocks (Institutional Order Zones)"""
-    obs = []
-    if len(df) < lookback + 5:
-        return obs
-    
-    highs = df['High'].values
-    lows = df['Low'].values
-    closes = df['Close'].values
-    opens = df['Open'].values
-    volumes = df['Volume'].values
-    
-    for i in range(lookback, len(df)-1):
-        body_size = abs(closes[i] - opens[i])
-        prev_body = abs(closes[i-1] - opens[i-1])
-        
-        is_bearish = closes[i] < opens[i]
-        # Check for Volume Spike
-        volume_spike = volumes[i] > np.mean(volumes[max(0, i-20):i]) * 1.3
-        
-        if is_bearish and body_size > prev_body * 0.8 and volume_spike:
-            if i+1 < len(closes):
-                next_move = closes[i+1] - closes[i]
-                if next_move > 0:
-                    strength = next_move / body_size if body_size > 0 else 0
-                    
-                    if strength > 0.5:
-                        obs.append({
-                            'type': 'bullish',
-                            'zone_low': lows[i],
-                            'zone_high': min(opens[i], closes[i]),
-                            'strength': strength,
-                            'index': i,
-                            'volume_ratio': volumes[i] / np.mean(volumes[max(0, i-20):i])
-                        })
-    
-    obs.sort(key=lambda x: x['strength'] * x['volume_ratio'], reverse=True)
-    return obs[:5]
+# Zones persist per ticker in .cache/zones/<T>.json. Each run only scans the bars added since
+# the last one. Active zones sit in two sorted indexes: by zone_high (for proximity queries)
+# and by zone_low (for mitigation). The newest bar may still be revised intraday, so it is
+# applied as a live overlay that is never written to disk.
+# In CI the store only survives between runs through the workflow's actions/cache step;
+# a cache miss just rebuilds every ticker's zones from its full history.
+ZONE_DIR = os.path.join(CACHE_DIR, "zones")
+ZONE_KEEP_MITIGATED = 100  # Mitigated zones kept for reference, oldest dropped first
+
+@dataclass(slots=True)
+class Zone:
+    id: int
+    kind: str           # "ob" = bullish order block
+    zone_low: float
+    zone_high: float
+    strength: float
+    volume_ratio: float
+    formed: str         # Date of the zone's candle
+    mitigated: str = "" # Date it was traded through
+
+class ZoneStore:
+    MITIGATED_BY = {"ob": "Close"}  # OB: mitigated by a close below its low
+
+    def __init__(self, ticker, zones=(), last_ts=None, last_close=None, next_id=0):
+        self.ticker = ticker
+        self.last_ts = last_ts          # Last bar folded into the store
+        self.last_close = last_close    # Its close, to spot re-adjusted history (splits)
+        self.next_id = next_id
+        self.zones = {}
+        self._by_high = {kind: [] for kind in self.MITIGATED_BY}  # Active only: sorted (zone_high, id)
+        self._by_low = {kind: [] for kind in self.MITIGATED_BY}   # Active only: sorted (zone_low, id)
+        self._live = None
+        for z in zones:
+            self._add(z)
+
+    @classmethod
+    def load(cls, ticker):
+        try:
+            with open(os.path.join(ZONE_DIR, f"{ticker}.json"), "r", encoding="utf-8") as f:
+                d = json.load(f)
+            zones = [Zone(**z) for z in d['zones'] if z['kind'] in cls.MITIGATED_BY]  # Drop retired kinds
+            return cls(ticker, zones, d['last_ts'], d['last_close'], d['next_id'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls(ticker)
+
+    def save(self):
+        try:
+            os.makedirs(ZONE_DIR, exist_ok=True)
+            with open(os.path.join(ZONE_DIR, f"{self.ticker}.json"), "w", encoding="utf-8") as f:
+                json.dump({"last_ts": self.last_ts, "last_close": self.last_close, "next_id": self.next_id,
+                           "zones": [asdict(z) for z in self.zones.values()]}, f)
+        except Exception as e:
+            swallowed("ZoneStore.save")
+            print(f"❌ Failed to save zones for {self.ticker}: {e}")
+
+    def _add(self, z):
+        self.zones[z.id] = z
+        self.next_id = max(self.next_id, z.id + 1)
+        if not z.mitigated:
+            bisect.insort(self._by_high[z.kind], (z.zone_high, z.id))
+            bisect.insort(self._by_low[z.kind], (z.zone_low, z.id))
+
+    def _new_zone(self, kind, low, high, strength, volume_ratio, formed):
+        z = Zone(self.next_id, kind, float(low), float(high), float(strength), float(volume_ratio), formed)
+        self.next_id += 1
+        return z
+
+    def _mitigate(self, bar, ts):
+        """Mark every active zone this bar traded through: one bisect, then an O(n) list delete per mitigated zone"""
+        for kind, col in self.MITIGATED_BY.items():
+            by_low = self._by_low[kind]
+            cut = bisect.bisect_right(by_low, (bar[col], math.inf))
+            for zone_low, zid in by_low[cut:]:
+                z = self.zones[zid]
+                z.mitigated = ts
+                by_high = self._by_high[kind]
+                del by_high[bisect.bisect_left(by_high, (z.zone_high, zid))]
+            del by_low[cut:]
+
+    def _zones_confirmed_at(self, arrays, j, dates, lookback):
+        """Zones whose candle is j-1 and that bar j confirms.
+        Bullish OB: a bearish candle on a volume spike (>1.3x the 20-bar mean) whose body is at least
+        0.8x the previous one, followed by a close that recovers more than half of that body."""
+        opens, highs, lows, closes, volumes = arrays
+        i = j - 1
+        found = []
+        if i >= lookback:
+            body_size = abs(closes[i] - opens[i])
+            prev_body = abs(closes[i-1] - opens[i-1])
+            vol_mean = np.mean(volumes[max(0, i-20):i])
+            next_move = closes[j] - closes[i]
+            if closes[i] < opens[i] and body_size > prev_body * 0.8 and volumes[i] > vol_mean * 1.3 and next_move > 0:
+                strength = next_move / body_size if body_size > 0 else 0
+                if strength > 0.5:
+                    found.append(self._new_zone("ob", lows[i], min(opens[i], closes[i]), strength, volumes[i] / vol_mean, dates[i]))
+        return found
+
+    def update(self, df, lookback=30):
+        """Fold in the bars after last_ts (all but the newest one, which becomes the live overlay)"""
+        if len(df) < 3:
+            return self
+        start = 0
+        if self.last_ts is not None:
+            start = int(df.index.searchsorted(pd.Timestamp(self.last_ts), side='right'))
+            prev = df['Close'].iloc[start - 1] if start > 0 else None
+            # Stored bar missing or re-adjusted (split / dividend back-fill): start over
+            if (prev is None or str(df.index[start - 1]) != self.last_ts
+                    or abs(prev - self.last_close) > abs(self.last_close) * 0.01):
+                count("zones.rebuild")
+                self.__init__(self.ticker)
+                start = 0
+        
+        arrays = tuple(df[c].to_numpy(float) for c in ('Open', 'High', 'Low', 'Close', 'Volume'))
+        dates = {i: df.index[i].strftime('%Y-%m-%d') for i in range(max(start - 1, 0), len(df))}
+        last = len(df) - 1
+        for j in range(start, last):
+            bar = {"Close": arrays[3][j]}
+            self._mitigate(bar, dates[j])
+            if j >= 1:
+                for z in self._zones_confirmed_at(arrays, j, dates, lookback):
+                    self._add(z)
+        if last > start or self.last_ts is None:
+            self.last_ts, self.last_close = str(df.index[last - 1]), float(arrays[3][last - 1])
+        
+        # Live overlay: what the newest (possibly partial) bar mitigates or confirms
+        saved_next_id = self.next_id
+        self._live = {"Close": arrays[3][last],
+                      "zones": self._zones_confirmed_at(arrays, last, dates, lookback)}
+        self.next_id = saved_next_id  # Live zones get committed with fresh ids once their bar is final
+        self._prune()
+        return self
+
+    def _prune(self):
+        mitigated = sorted((z for z in self.zones.values() if z.mitigated), key=lambda z: z.mitigated)
+        for z in mitigated[:max(0, len(mitigated) - ZONE_KEEP_MITIGATED)]:
+            del self.zones[z.id]
+
+    def active_near(self, price, pct, kind="ob"):
+        """Active zones whose zone_high is within pct of price: bisect on the sorted index"""
+        lo, hi = price * (1 - pct), price * (1 + pct)
+        by_high = self._by_high[kind]
+        found = [self.zones[zid] for _, zid in by_high[bisect.bisect_left(by_high, (lo, -1)):bisect.bisect_right(by_high, (hi, math.inf))]]
+        if self._live:
+            trigger = self._live[self.MITIGATED_BY[kind]]
+            found = [z for z in found if z.zone_low <= trigger]
+            found += [z for z in self._live['zones'] if z.kind == kind and lo <= z.zone_high <= hi]
+        return found
 
 # ==================== 4. Core: Market Structure Break (BOS) ====================
 def detect_market_structure_break(df, lookback=50):
@@ -136,20 +396,19 @@ def detect_market_structure_break(df, lookback=50):
         return False, 0, "N/A"
     
     recent = df.tail(lookback)
+    return structure_break_from_arrays(recent['High'].to_numpy(), recent['Low'].to_numpy(), recent['Close'].to_numpy())
+
+def structure_break_from_arrays(highs, lows, closes):
     swing_highs = []
     swing_lows = []
     
     # Simple Swing High/Low Identification
-    for i in range(2, len(recent)-2):
-        if (recent['High'].iloc[i] > recent['High'].iloc[i-1] and 
-            recent['High'].iloc[i] > recent['High'].iloc[i-2] and
-            recent['High'].iloc[i] > recent['High'].iloc[i+1]):
-            swing_highs.append((i, recent['High'].iloc[i]))
+    for i in range(2, len(highs)-2):
+        if highs[i] > highs[i-1] and highs[i] > highs[i-2] and highs[i] > highs[i+1]:
+            swing_highs.append((i, highs[i]))
         
-        if (recent['Low'].iloc[i] < recent['Low'].iloc[i-1] and 
-            recent['Low'].iloc[i] < recent['Low'].iloc[i-2] and
-            recent['Low'].iloc[i] < recent['Low'].iloc[i+1]):
-            swing_lows.append((i, recent['Low'].iloc[i]))
+        if lows[i] < lows[i-1] and lows[i] < lows[i-2] and lows[i] < lows[i+1]:
+            swing_lows.append((i, lows[i]))
     
     if len(swing_lows) < 2 or len(swing_highs) < 1:
         return False, 0, "Insufficient Data"
@@ -160,7 +419,7 @@ def detect_market_structure_break(df, lookback=50):
     
     if last_low > prev_low:
         last_high = swing_highs[-1][1]
-        current_price = recent['Close'].iloc[-1]
+        current_price = closes[-1]
         
         # If current price breaks previous Swing High
         if current_price > last_high:
@@ -170,14 +429,28 @@ def detect_market_structure_break(df, lookback=50):
     return False, 0, "No BOS"
 
 # ==================== 5. Core: Multi-Timeframe Confirmation ====================
-def multi_timeframe_confirmation(ticker):
-    """Check if multiple timeframes align bullishly"""
+def fetch_mtf_frames(ticker):
+    """Download the 4H / Weekly frames used by multi_timeframe_confirmation"""
+    try:
+        df_4h = yf_history(ticker, "3mo", "1h")
+    except:
+        swallowed("fetch_mtf_frames")
+        df_4h = None
+    try:
+        df_w = yf_history(ticker, "1y", "1wk")
+    except:
+        swallowed("fetch_mtf_frames")
+        df_w = None
+    return df_4h, df_w
+
+def multi_timeframe_confirmation(ticker, frames=None):
+    """Check if multiple timeframes align bullishly (frames: prefetched (df_4h, df_w))"""
     try:
         scores = 0
         reasons = []
+        df_4h, df_w = frames if frames is not None else fetch_mtf_frames(ticker)
         
         # Check 4H (Medium-term Trend)
-        df_4h = yf.Ticker(ticker).history(period="3mo", interval="1h")
         if df_4h is not None and len(df_4h) > 50:
             sma20_4h = df_4h['Close'].rolling(20).mean().iloc[-1]
             if df_4h['Close'].iloc[-1] > sma20_4h:
@@ -185,7 +458,6 @@ def multi_timeframe_confirmation(ticker):
                 reasons.append("⏰ 4H Trend Confirmed")
         
         # Check Weekly (Long-term Trend)
-        df_w = yf.Ticker(ticker).history(period="1y", interval="1wk")
         if df_w is not None and len(df_w) > 20:
             sma10_w = df_w['Close'].rolling(10).mean().iloc[-1]
             if df_w['Close'].iloc[-1] > sma10_w:
@@ -194,6 +466,7 @@ def multi_timeframe_confirmation(ticker):
         
         return scores, reasons
     except:
+        swallowed("multi_timeframe_confirmation")
         return 0, []
 
 # ==================== 6. Beta & Fundamental Check ====================
@@ -219,7 +492,9 @@ def check_fundamentals(ticker):
 # ==================== 7. Sector Classification ====================
 def get_stock_sector(ticker):
     try:
-        info = yf.Ticker(ticker).info
+        count("net.yfinance")
+        with span("net.yfinance.info"):
+            info = yf.Ticker(ticker).info
         sector = info.get('sector', 'Unknown')
         industry = info.get('industry', 'Unknown')
         if "Semiconductor" in industry: 
@@ -228,77 +503,209 @@ def get_stock_sector(ticker):
             return "🪙 Crypto & Fintech"
         return SECTOR_MAP.get(sector, "🌐 Other")
     except: 
+        swallowed("get_stock_sector")
         return "🌐 Other"
 
 # ==================== 8. Auto Selection ====================
-def auto_select_candidates():
-    print("🚀 Starting Super Screener (Priority First)...")
-    full_list = PRIORITY_TICKERS + list(set(STATIC_UNIVERSE) - set(PRIORITY_TICKERS))
-    valid_tickers = []
-    
+@timed("stage.spy")
+def get_spy_returns():
     try:
-        spy = yf.Ticker("SPY").history(period="1y")
+        spy = yf_history("SPY", "1y")
         if spy.empty: 
             print("⚠️ SPY data empty, proceeding without beta calculation.")
-            spy_returns = []
-        else:
-            spy_returns = spy['Close'].pct_change().dropna()
+            return []
+        return spy['Close'].pct_change().dropna()
     except: 
-        spy_returns = []
+        swallowed("get_spy_returns")
+        return []
+
+@ticker_stage("ticker.screen")
+def screen_ticker(ticker, spy_returns):
+    """Apply the trend / liquidity / beta filters. Returns (candidate, daily df) or None"""
+    try:
+        # Skip Market Cap check to speed up or if info fails, we can trust the static list for now
+        # try:
+        #     info = yf.Ticker(ticker).fast_info
+        #     if info.market_cap < 3_000_000_000: 
+        #         continue
+        # except: 
+        #     pass
+        
+        df = fetch_data_safe(ticker, "1y", "1d")
+        if df is None or len(df) < 200: 
+            return None
+        as_of = spy_returns.index[-1].strftime('%Y-%m-%d') if len(spy_returns) > 0 else None
+        if not passes_quality_gate(ticker, df, as_of):
+            return None
+        
+        close = df['Close'].iloc[-1]
+        sma200 = df['Close'].rolling(200).mean().iloc[-1]
+        
+        # 🔥 V8 Update: Strict Trend Filter (Price > 200MA)
+        if close < sma200: 
+            return None 
+        
+        avg_vol = df['Volume'].tail(30).mean()
+        avg_price = df['Close'].tail(30).mean()
+        dollar_vol = avg_vol * avg_price
+        if dollar_vol < 100_000_000: # Lowered slightly to ensure we get results
+            return None 
+        
+        if len(spy_returns) > 0:
+            stock_returns = df['Close'].pct_change().dropna()
+            beta = calculate_beta(stock_returns, spy_returns)
+            if beta < 0.5: 
+                return None
+        
+        sector_name = get_stock_sector(ticker)
+        print(f"   ✅ {ticker} Selected! ({sector_name})")
+        return {'ticker': ticker, 'sector': sector_name}, df
+    except Exception as e: 
+        swallowed("screen_ticker")
+        # print(f"Skipping {ticker}: {e}")
+        return None
+
+def get_screen_universe():
+    return PRIORITY_TICKERS + list(set(STATIC_UNIVERSE) - set(PRIORITY_TICKERS))
+
+def auto_select_candidates():
+    print("🚀 Starting Super Screener (Priority First)...")
+    spy_returns = get_spy_returns()
+    valid_tickers = []
     
     print(f"🔍 Filtering tickers...")
-    for ticker in full_list:
-        try:
-            # Skip Market Cap check to speed up or if info fails, we can trust the static list for now
-            # try:
-            #     info = yf.Ticker(ticker).fast_info
-            #     if info.market_cap < 3_000_000_000: 
-            #         continue
-            # except: 
-            #     pass
-            
-            df = yf.Ticker(ticker).history(period="1y")
-            if df is None or len(df) < 200: 
-                continue
-            
-            close = df['Close'].iloc[-1]
-            sma200 = df['Close'].rolling(200).mean().iloc[-1]
-            
-            # 🔥 V8 Update: Strict Trend Filter (Price > 200MA)
-            if close < sma200: 
-                continue 
-            
-            avg_vol = df['Volume'].tail(30).mean()
-            avg_price = df['Close'].tail(30).mean()
-            dollar_vol = avg_vol * avg_price
-            if dollar_vol < 100_000_000: # Lowered slightly to ensure we get results
-                continue 
-            
-            if len(spy_returns) > 0:
-                stock_returns = df['Close'].pct_change().dropna()
-                beta = calculate_beta(stock_returns, spy_returns)
-                if beta < 0.5: 
-                    continue
-            
-            sector_name = get_stock_sector(ticker)
-            print(f"   ✅ {ticker} Selected! ({sector_name})")
-            valid_tickers.append({'ticker': ticker, 'sector': sector_name})
-        except Exception as e: 
-            # print(f"Skipping {ticker}: {e}")
-            continue
+    for ticker in get_screen_universe():
+        res = screen_ticker(ticker, spy_returns)
+        if res:
+            valid_tickers.append(res[0])
     
     print(f"🏆 Filtering Complete! Found {len(valid_tickers)} candidates.")
     return valid_tickers
 
+# ==================== 8b. HTTP Client ====================
+# One pooled keep-alive session for Polygon + Discord. Connection errors, 429 and 5xx are
+# retried with full-jitter backoff; 429 waits for the server's Retry-After / retry_after.
+# A POST (Discord) may already have been accepted after a 5xx, read timeout or reset, so it is
+# only retried on 429 and on errors raised before the request went out.
+HTTP_TIMEOUT = (5, 15)  # (connect, read) seconds
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5      # Base delay, doubled per attempt
+HTTP_MAX_WAIT = 30      # Never sleep longer than this for one retry
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+HTTP_CACHE_DIR = os.path.join(CACHE_DIR, "http")
+
+_HTTP_SESSION = None
+_HTTP_LOCK = threading.Lock()
+
+def http_session():
+    global _HTTP_SESSION
+    with _HTTP_LOCK:
+        if _HTTP_SESSION is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = "DailyDip/1.0"
+            _HTTP_SESSION = session
+        return _HTTP_SESSION
+
+def retry_delay(resp, attempt):
+    """Seconds to wait before the next attempt"""
+    if resp is not None:
+        wait = resp.headers.get("Retry-After")
+        if resp.status_code == 429:
+            try:
+                wait = resp.json().get("retry_after", wait)  # Discord puts it in the body
+            except (ValueError, AttributeError):
+                swallowed("retry_delay")  # Non-JSON (or non-object) 429 body: use the header
+        try:
+            if wait is not None:
+                return min(max(float(wait), 0), HTTP_MAX_WAIT)
+        except (TypeError, ValueError):
+            pass  # HTTP-date Retry-After: fall back to backoff
+    return random.uniform(0, min(HTTP_BACKOFF * 2 ** attempt, HTTP_MAX_WAIT))
+
+def never_sent(exc):
+    """True when the request failed before any byte reached the server (connect timeout, refused, DNS)"""
+    from urllib3.exceptions import NewConnectionError
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, NewConnectionError)
+
+def http_request(method, url, retries=HTTP_RETRIES, **kwargs):
+    """session.request() with timeout + bounded retries. Returns the last response, raises the last network error"""
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    session = http_session()
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    retry_statuses = RETRY_STATUSES if idempotent else {429}
+    for attempt in range(retries + 1):
+        resp = None
+        try:
+            resp = session.request(method, url, **kwargs)
+            if resp.status_code not in retry_statuses or attempt == retries:
+                return resp
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries or not (idempotent or never_sent(e)):
+                raise
+        count("net.retry")
+        if resp is not None and resp.status_code == 429:
+            count("net.rate_limited")
+        time.sleep(retry_delay(resp, attempt))
+
+def cached_get_json(url, cache_name, params=None):
+    """GET a JSON body, revalidated with ETag / If-Modified-Since against .cache/http/<cache_name>.json.
+    The cached copy is also served when the network fails."""
+    path = os.path.join(HTTP_CACHE_DIR, f"{cache_name}.json")
+    cached = None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        pass
+    
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    
+    try:
+        resp = http_request("GET", url, params=params, headers=headers)
+    except requests.RequestException:
+        if cached is None:
+            raise
+        count("net.cache.stale")
+        return cached["body"]
+    if resp.status_code == 304 and cached is not None:
+        count("net.cache.hit")
+        return cached["body"]
+    resp.raise_for_status()
+    body = resp.json()
+    count("net.cache.miss")
+    
+    etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+    if etag or last_modified:
+        try:
+            os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"etag": etag, "last_modified": last_modified, "body": body}, f)
+        except OSError:
+            swallowed("cached_get_json")
+    return body
+
 # ==================== 9. News Fetching ====================
+@timed("stage.news")
 def get_polygon_news():
     if not API_KEY: 
         return "<div style='padding:20px'>API Key Missing</div>"
     news_html = ""
     try:
-        url = f"https://api.polygon.io/v2/reference/news?limit=15&order=desc&sort=published_utc&apiKey={API_KEY}"
-        resp = requests.get(url, timeout=10)
-        data = resp.json()
+        params = {"limit": 15, "order": "desc", "sort": "published_utc", "apiKey": API_KEY}
+        count("net.polygon")
+        with span("net.polygon.news"):
+            data = cached_get_json(f"{POLYGON_BASE_URL}/v2/reference/news", "polygon_news", params)
         if data.get('results'):
             for item in data['results']:
                 title = item.get('title')
@@ -309,15 +716,64 @@ def get_polygon_news():
         else: 
             news_html = "<div style='padding:20px;text-align:center'>No News Found</div>"
     except Exception as e: 
+        swallowed("get_polygon_news")
         news_html = f"<div style='padding:20px'>News Error: {e}</div>"
     return news_html
 
+TICKER_NEWS_DIR = os.path.join(CACHE_DIR, "news")
+TICKER_NEWS_KEEP = 10  # Articles kept per ticker in the cache
+TICKER_NEWS_SHOW = 5   # Articles shown in the modal
+
+def get_ticker_news(ticker):
+    """Latest headlines for one ticker. .cache/news/<T>.json keeps the articles seen so far plus a
+    published_utc watermark, so each run only asks Polygon for articles newer than that."""
+    path = os.path.join(TICKER_NEWS_DIR, f"{ticker}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        watermark = str(cached['watermark'])
+        articles = [a for a in cached['articles'] if a['url'] is not None and a['published'] is not None]
+    except (OSError, ValueError, KeyError, TypeError):
+        watermark, articles = "", []  # Missing or malformed cache: refetch as if cold
+    if not API_KEY:
+        return articles[:TICKER_NEWS_SHOW]
+    
+    params = {"ticker": ticker, "limit": TICKER_NEWS_KEEP, "order": "desc", "sort": "published_utc", "apiKey": API_KEY}
+    if watermark:
+        params["published_utc.gt"] = watermark
+    try:
+        count("net.polygon")
+        with span("net.polygon.ticker_news"):
+            resp = http_request("GET", f"{POLYGON_BASE_URL}/v2/reference/news", params=params)
+        resp.raise_for_status()
+        fresh = [{"title": item.get('title', ''), "url": item.get('article_url', ''),
+                  "publisher": item.get('publisher', {}).get('name', 'Unknown'),
+                  "published": item.get('published_utc', '')}
+                 for item in resp.json().get('results', [])]
+    except Exception:
+        swallowed("get_ticker_news")
+        return articles[:TICKER_NEWS_SHOW]
+    
+    if not fresh:
+        count("net.cache.hit")
+        return articles[:TICKER_NEWS_SHOW]
+    seen = {a['url'] for a in fresh}
+    articles = sorted(fresh + [a for a in articles if a['url'] not in seen], key=lambda a: a['published'], reverse=True)[:TICKER_NEWS_KEEP]
+    try:
+        os.makedirs(TICKER_NEWS_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"watermark": articles[0]['published'], "articles": articles}, f)
+    except OSError:
+        swallowed("get_ticker_news.cache")
+    return articles[:TICKER_NEWS_SHOW]
+
 # ==================== 10. Market Analysis ====================
+@timed("stage.market")
 def get_market_condition():
     try:
         print("🔍 Checking Market...")
-        spy = yf.Ticker("SPY").history(period="6mo")
-        qqq = yf.Ticker("QQQ").history(period="6mo")
+        spy = yf_history("SPY", "6mo")
+        qqq = yf_history("QQQ", "6mo")
         if spy.empty or qqq.empty: 
             return "NEUTRAL", "Insufficient Data", 0
         
@@ -339,26 +795,197 @@ def get_market_condition():
         else: 
             return "NEUTRAL", "🟡 Market Choppy", 0
     except: 
+        swallowed("get_market_condition")
         return "NEUTRAL", "Check Failed", 0
 
+# ==================== 10b. Relative Strength & Correlation ====================
+# One pass over the date-aligned returns panel of all analysed tickers (+ SPY):
+# RS ranks vs SPY, sector aggregates and the correlation matrix the top 5 is diversified with.
+BENCHMARK = "SPY"
+RS_WINDOWS = (21, 63)  # 1M / 3M excess return vs SPY, ranked across tickers
+CORR_WINDOW = 63       # Days of returns behind the correlation matrix
+MAX_PICK_CORR = 0.75   # Top 5 picks must correlate less than this with each other
+
+def returns_panel(returns):
+    """Date-aligned daily returns: one column per ticker, one row per calendar date"""
+    cols = {}
+    for t, r in returns.items():
+        if r is None or len(r) == 0:
+            continue
+        r = pd.Series(np.asarray(r, dtype=float), index=pd.DatetimeIndex(r.index.strftime('%Y-%m-%d')))
+        cols[t] = r[~r.index.duplicated(keep='last')]
+    return pd.DataFrame(cols).sort_index()
+
+@timed("stage.cross_section")
+def cross_sectional_strength(returns, sectors):
+    """returns: {ticker: daily returns} incl. BENCHMARK, sectors: {ticker: sector}.
+    Returns {"rs": {t: 0-100 rank}, "rs_sector": {t: 3M % vs own sector}, "sectors": {sector: stats}, "corr": DataFrame}"""
+    empty = {"rs": {}, "rs_sector": {}, "sectors": {}, "corr": None}
+    panel = returns_panel(returns)
+    tickers = [t for t in panel.columns if t in sectors and t != BENCHMARK]
+    if BENCHMARK not in panel or len(tickers) < 2:
+        return empty
+    
+    logp = np.log1p(panel[tickers].fillna(0))  # A missing day counts as flat
+    logb = np.log1p(panel[BENCHMARK].fillna(0))
+    
+    # Rolling RS: excess log return per window, ranked across tickers on every date
+    ranks = [logp.rolling(w).sum().sub(logb.rolling(w).sum(), axis=0).rank(axis=1, pct=True) for w in RS_WINDOWS]
+    rs_now = (sum(ranks) / len(ranks)).iloc[-1] * 100
+    
+    # Sector aggregates: equal-weight sector return over the long window, members vs their sector
+    w = RS_WINDOWS[-1]
+    sector_of = pd.Series(sectors)[tickers]
+    member_ret = logp.tail(w).sum()
+    sector_ret = member_ret.groupby(sector_of).mean()
+    bench_ret = logb.tail(w).sum()
+    rs_sector = (np.expm1(member_ret - sector_ret[sector_of].to_numpy()) * 100).round(1)
+    sector_rs = rs_now.groupby(sector_of).mean()
+    sector_stats = {
+        sec: {"rs": None if pd.isna(sector_rs[sec]) else round(float(sector_rs[sec])),
+              "ret": round(float(np.expm1(sector_ret[sec]) * 100), 1),
+              "vs_spy": round(float(np.expm1(sector_ret[sec] - bench_ret) * 100), 1),
+              "count": int((sector_of == sec).sum())}
+        for sec in sector_ret.index
+    }
+    
+    return {
+        "rs": {t: round(float(v)) for t, v in rs_now.items() if not pd.isna(v)},
+        "rs_sector": {t: float(v) for t, v in rs_sector.items()},
+        "sectors": sector_stats,
+        "corr": panel[tickers].tail(CORR_WINDOW).corr(min_periods=20),
+    }
+
+def diversified_top(results, corr, n=5, max_corr=MAX_PICK_CORR):
+    """Best scores first, skipping names too correlated with one already picked (topped up by score if needed)"""
+    picked, skipped = [], []
+    for r in results:
+        if len(picked) == n:
+            break
+        too_close = corr is not None and r.ticker in corr.index and any(
+            p.ticker in corr.columns and corr.at[r.ticker, p.ticker] > max_corr for p in picked)
+        (skipped if too_close else picked).append(r)
+    count("history.correlated_skips", len(skipped))
+    picked += skipped[:n - len(picked)]
+    return sorted(picked, key=lambda r: r.score, reverse=True)
+
 # ==================== 11. Data Fetching ====================
+def yf_history(ticker, period, interval="1d"):
+    """yfinance download with network accounting (every history call goes through here)"""
+    count("net.yfinance")
+    with span("net.yfinance.history"):
+        return yf.Ticker(ticker).history(period=period, interval=interval)
+
 def fetch_data_safe(ticker, period, interval):
     try:
-        dat = yf.Ticker(ticker).history(period=period, interval=interval)
+        dat = yf_history(ticker, period, interval)
         if dat is None or dat.empty: 
             return None
         if not isinstance(dat.index, pd.DatetimeIndex): 
             dat.index = pd.to_datetime(dat.index)
         dat = dat.rename(columns={"Open": "Open", "High": "High", "Low": "Low", "Close": "Close", "Volume": "Volume"})
+        if COMPACT_OHLCV:
+            dat = compact_ohlcv(dat)
         return dat
     except: 
+        swallowed("fetch_data_safe")
         return None
 
+def compact_ohlcv(df):
+    """Keep OHLCV (+ Stock Splits for the quality gate), prices as float32, volume in the smallest unsigned int that fits"""
+    df = df[[c for c in ('Open', 'High', 'Low', 'Close', 'Volume', 'Stock Splits') if c in df.columns]].copy()
+    for col in ('Open', 'High', 'Low', 'Close', 'Stock Splits'):
+        if col in df.columns:
+            df[col] = df[col].astype(np.float32)
+    df['Volume'] = pd.to_numeric(df['Volume'].fillna(0).clip(lower=0).round(), downcast='unsigned')
+    return df
+
+# ==================== 11b. Data Quality Gate ====================
+# Runs on the screen download, before the beta / sector / hourly / MTF / earnings / news requests
+# and before any SMC work. One vectorized pass over the recent bars; any reason = ticker skipped.
+QUALITY_WINDOW = 60       # Recent bars the gate looks at
+MAX_STALE_SESSIONS = 1    # Sessions the last bar may trail the benchmark's last bar
+MAX_ZERO_VOLUME = 2       # Zero-volume bars allowed in the window
+MAX_FLAT_BARS = 2         # High == Low bars (halts / no trades) allowed in the window
+MAX_DATE_GAP = 5          # Business days between two bars before it counts as a hole
+SPLIT_RATIOS = (2, 3, 4, 5, 8, 10, 15, 20)  # Common forward / reverse split factors
+SPLIT_VOLUME_TOLERANCE = 1.25  # Volume must rescale by the split factor within this factor
+
+def check_data_quality(df, as_of=None):
+    """Reasons this daily frame should not be analysed, [] when clean.
+    as_of: 'YYYY-MM-DD' of the latest session (benchmark's last bar); today when unknown."""
+    if df is None or df.empty:
+        return ["empty: no bars"]
+    recent = df.tail(QUALITY_WINDOW)
+    ohlc = recent[['Open', 'High', 'Low', 'Close']].to_numpy(float)
+    vol = recent['Volume'].to_numpy(float)
+    o, h, l, c = ohlc.T
+    reasons = []
+    
+    missing = np.isnan(ohlc).any(axis=1) | np.isnan(vol)
+    if missing.any():
+        reasons.append(f"nan_gap: {int(missing.sum())} bars with missing values")
+    ok = ~missing
+    bad = ok & ((h < l) | (c > h * 1.0001) | (c < l * 0.9999) | (l <= 0))  # Tolerance for float32 frames
+    if bad.any():
+        reasons.append(f"bad_ohlc: {int(bad.sum())} inconsistent bars")
+    zero = int((ok & (vol == 0)).sum())
+    if zero > MAX_ZERO_VOLUME:
+        reasons.append(f"zero_volume: {zero} of the last {len(recent)} bars")
+    flat = int((ok & (h == l)).sum())
+    if flat > MAX_FLAT_BARS:
+        reasons.append(f"flat_bars: {flat} bars with High == Low (halted?)")
+    
+    # Overnight jumps the size of a split are only a problem when history was not back-adjusted.
+    # yfinance reports splits in `Stock Splits`: trust it when present, otherwise require the
+    # volume to rescale by the same factor (share count changed) so earnings gaps aren't flagged.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.nan_to_num(np.maximum(o[1:] / c[:-1], c[:-1] / o[1:]))
+    if 'Stock Splits' in recent.columns:
+        factor = np.nan_to_num(recent['Stock Splits'].to_numpy(float)[1:])
+        with np.errstate(divide='ignore'):
+            factor = np.where(factor > 0, np.maximum(factor, 1 / factor), 0)  # Reverse splits come as < 1
+        split = (factor > 1) & (np.abs(ratio / np.where(factor > 1, factor, 1) - 1) < 0.03)
+    else:
+        split = np.zeros(len(ratio), dtype=bool)
+        near_split = (np.abs(ratio[:, None] / np.asarray(SPLIT_RATIOS) - 1) < 0.03).any(axis=1)
+        for i in np.flatnonzero(near_split):  # Rare: only bars that already look like a split
+            before, after = vol[max(0, i - 9):i + 1], vol[i + 1:i + 11]
+            if len(before) < 5 or len(after) < 5 or np.median(before) <= 0 or o[i + 1] <= 0:
+                continue
+            price_scale = c[i] / o[i + 1]  # > 1: price divided (forward split), volume should multiply
+            vol_scale = np.median(after) / np.median(before)
+            split[i] = abs(np.log(vol_scale / price_scale)) < np.log(SPLIT_VOLUME_TOLERANCE)
+    if split.any():
+        reasons.append(f"split: {int(split.sum())} overnight jump(s) of {ratio[split][-1]:.2f}x, unadjusted split?")
+    
+    days = recent.index.strftime('%Y-%m-%d').to_numpy(dtype='datetime64[D]')
+    gaps = np.busday_count(days[:-1], days[1:])
+    if len(gaps) and gaps.max() > MAX_DATE_GAP:
+        reasons.append(f"date_gap: {int(gaps.max())} sessions between two bars")
+    
+    max_lag = MAX_STALE_SESSIONS if as_of else MAX_STALE_SESSIONS + 1  # Today's session may not have a bar yet
+    lag = int(np.busday_count(days[-1], np.datetime64(as_of or datetime.now().strftime('%Y-%m-%d'), 'D')))
+    if lag > max_lag:
+        reasons.append(f"stale: last bar {days[-1]} is {lag} sessions old")
+    return reasons
+
+def passes_quality_gate(ticker, df, as_of=None):
+    with span("ticker.quality"):
+        reasons = check_data_quality(df, as_of)
+    if reasons:
+        record_rejection(ticker, reasons)
+        print(f"   ⛔ {ticker} skipped: {'; '.join(reasons)}")
+        return False
+    return True
+
 # ==================== 12. Earnings Check ====================
 def check_earnings(ticker):
     try:
         stock = yf.Ticker(ticker)
-        calendar = stock.calendar
+        count("net.yfinance")
+        with span("net.yfinance.calendar"):
+            calendar = stock.calendar
         # Handle different yfinance versions for calendar
         if calendar is not None:
             if isinstance(calendar, dict): # New yfinance
@@ -372,6 +999,7 @@ def check_earnings(ticker):
                 if 0 <= days_diff <= 7:
                     return f"⚠️ Earnings: {days_diff}d"
     except:
+        swallowed("check_earnings")
         pass
     return ""
 
@@ -405,156 +1033,352 @@ def calculate_indicators(df):
     
     return rsi, rvol, golden_cross, trend_bullish, perf_30d
 
+class _RollingSum:
+    """Sum of the last `size` values. O(1) push, and O(1) undo of the latest push"""
+    __slots__ = ("size", "values", "total", "pushes")
+    RESYNC_EVERY = 1024  # Re-add the window from scratch now and then so float drift can't build up
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size + 1)  # One spare: undo restores the value that slid out
+        self.total = 0.0
+        self.pushes = 0
+
+    def push(self, v):
+        if len(self.values) >= self.size:
+            self.total -= self.values[-self.size]
+        self.values.append(v)
+        self.total += v
+        self.pushes += 1
+        if self.pushes % self.RESYNC_EVERY == 0:
+            self.total = math.fsum(list(self.values)[-self.size:])
+
+    def undo(self):
+        self.total -= self.values.pop()
+        if len(self.values) >= self.size:
+            self.total += self.values[-self.size]
+
+    @property
+    def full(self):
+        return len(self.values) >= self.size
+
+    def mean(self):
+        return self.total / self.size if self.full else math.nan
+
+    def to_dict(self):
+        return {"values": list(self.values), "total": self.total, "pushes": self.pushes}
+
+    @classmethod
+    def from_dict(cls, size, d):
+        obj = cls(size)
+        obj.values.extend(d['values'])
+        obj.total, obj.pushes = d['total'], d['pushes']
+        return obj
+
+class IndicatorState:
+    """calculate_indicators() kept up to date one bar at a time.
+    update() is O(1); a bar with the same timestamp as the last one revises it (intraday daily bar)."""
+    WINDOWS = {"c50": 50, "c200": 200, "v10": 10, "gain": 14, "loss": 14}
+
+    def __init__(self):
+        for name, size in self.WINDOWS.items():
+            setattr(self, name, _RollingSum(size))
+        self.closes = deque(maxlen=32)  # perf_30d looks 30 bars back (+1 spare for revisions)
+        self.smas = deque(maxlen=6)     # (sma50, sma200) of the last bars, golden cross looks 5 back
+        self.last_ts = None
+        self.bars = 0
+
+    @classmethod
+    def from_frame(cls, df):
+        state = cls()
+        for ts, close, volume in zip(df.index, df['Close'].to_numpy(float), df['Volume'].to_numpy(float)):
+            state.update(ts.strftime('%Y-%m-%d'), close, volume)
+        return state
+
+    def update(self, ts, close, volume):
+        if ts == self.last_ts:
+            self._undo()
+        prev = self.closes[-1] if self.closes else None
+        delta = close - prev if prev is not None else 0.0  # Same as the 0-filled first diff in calculate_indicators
+        close, volume = float(close), float(volume)
+        self.gain.push(max(delta, 0.0))
+        self.loss.push(max(-delta, 0.0))
+        self.c50.push(close)
+        self.c200.push(close)
+        self.v10.push(volume)
+        self.closes.append(close)
+        self.smas.append((self.c50.mean(), self.c200.mean()))
+        self.last_ts = ts
+        self.bars += 1
+
+    def _undo(self):
+        for name in self.WINDOWS:
+            getattr(self, name).undo()
+        self.closes.pop()
+        self.smas.pop()
+        self.bars -= 1
+
+    def values(self):
+        """(rsi, rvol, golden_cross, trend_bullish, perf_30d) for the latest bar, as scalars"""
+        rsi = math.nan
+        if self.gain.full:
+            g, l = self.gain.total, self.loss.total
+            rsi = 100 - 100 / (1 + g / l) if l > 0 else (100.0 if g > 0 else math.nan)
+        v_mean = self.v10.mean()
+        rvol = self.v10.values[-1] / v_mean if v_mean > 0 else math.nan
+        
+        close = self.closes[-1]
+        sma50, sma200 = self.smas[-1]
+        trend_bullish = bool(close > sma200)
+        golden_cross = False
+        if self.bars > 5:
+            old50, old200 = self.smas[-5]
+            golden_cross = bool(sma50 > sma200 and old50 <= old200)
+        perf_30d = (close - self.closes[-30]) / self.closes[-30] * 100 if self.bars > 30 else 0
+        return rsi, rvol, golden_cross, trend_bullish, perf_30d
+
+    def as_indicators(self):
+        """Same tuple shape calculate_indicators() returns, for calculate_advanced_score()"""
+        rsi, rvol, golden_cross, trend_bullish, perf_30d = self.values()
+        return pd.Series([rsi]), pd.Series([rvol]), golden_cross, trend_bullish, perf_30d
+
+    def to_dict(self):
+        d = {name: getattr(self, name).to_dict() for name in self.WINDOWS}
+        d.update(closes=list(self.closes), smas=[list(p) for p in self.smas], last_ts=self.last_ts, bars=self.bars)
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls()
+        for name, size in cls.WINDOWS.items():
+            setattr(state, name, _RollingSum.from_dict(size, d[name]))
+        state.closes.extend(d['closes'])
+        state.smas.extend(tuple(p) for p in d['smas'])
+        state.last_ts, state.bars = d['last_ts'], d['bars']
+        return state
+
 # ==================== 14. 🔥 Advanced Scoring System ====================
-def calculate_advanced_score(ticker, df, entry, sl, tp, market_bonus, sweep_type, indicators):
-    """Refined Scoring System"""
+# Every setup is a detector: fn(features) -> Hit | None, registered with @register_strategy.
+# Features are computed once per ticker; run_strategies() evaluates all detectors in one pass
+# (registration order = reason order) and times each one as span "strategy.<name>".
+# A new strategy is just another decorated function.
+@dataclass(slots=True)
+class Features:
+    """Shared per-ticker inputs for the detectors"""
+    ticker: str
+    df: object
+    entry: float
+    sl: float
+    tp: float
+    market_bonus: int
+    sweep_type: str | None
+    found_fvg: bool
+    price: float
+    rsi: float
+    rvol: float
+    golden_cross: bool
+    trend: bool
+    perf_30d: float
+    rr: float
+    recent: tuple | None  # (highs, lows, closes) of the last 50 bars, None when there are fewer
+    zones: object
+    mtf_frames: object
+
+@dataclass(slots=True)
+class Hit:
+    points: int = 0
+    reasons: tuple = ()
+    confluence: bool = False  # Counts toward the confluence bonus
+    strategy: bool = False    # Counts as an independent strategy signal
+    setup: bool = False       # Qualifies the ticker for a LONG signal
+
+@dataclass(slots=True)
+class Strategy:
+    name: str
+    fn: object
+
+STRATEGIES = []
+
+def register_strategy(name):
+    def wrap(fn):
+        STRATEGIES.append(Strategy(name, fn))
+        return fn
+    return wrap
+
+def build_features(ticker, df, entry, sl, tp, market_bonus, sweep_type, found_fvg, indicators, mtf_frames=None, zones=None):
+    rsi, rvol, golden_cross, trend, perf_30d = indicators
+    risk = entry - sl
+    reward = tp - entry
+    recent = None
+    if len(df) >= 50:
+        tail = df.tail(50)
+        recent = (tail['High'].to_numpy(), tail['Low'].to_numpy(), tail['Close'].to_numpy())
+    return Features(
+        ticker=ticker, df=df, entry=entry, sl=sl, tp=tp, market_bonus=market_bonus,
+        sweep_type=sweep_type, found_fvg=found_fvg, price=df['Close'].iloc[-1],
+        rsi=rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50,
+        rvol=rvol.iloc[-1] if not pd.isna(rvol.iloc[-1]) else 1.0,
+        golden_cross=golden_cross, trend=trend, perf_30d=perf_30d,
+        rr=reward / risk if risk > 0 else 0, recent=recent,
+        zones=zones if zones is not None else ZoneStore(ticker).update(df), mtf_frames=mtf_frames)
+
+def run_strategies(features):
+    """All registered detectors over one ticker's features -> [(name, Hit)] in registration order"""
+    hits = []
+    for strategy in STRATEGIES:
+        try:
+            with span(f"strategy.{strategy.name}"):
+                hit = strategy.fn(features)
+        except Exception as e:
+            swallowed(f"strategy.{strategy.name}")
+            print(f"Strategy {strategy.name} failed for {features.ticker}: {e}")
+            continue
+        if hit:
+            hits.append((strategy.name, hit))
+    return hits
+
+def score_hits(features, hits):
+    """Fold detector hits into (score, reasons, rr, rvol, perf_30d, strategies)"""
+    score = 50 + features.market_bonus
+    reasons = []
+    confluence_count = 0
     strategies = 0
+    for _, hit in hits:
+        score += hit.points
+        reasons.extend(hit.reasons)
+        confluence_count += hit.confluence
+        strategies += hit.strategy
+    
+    # Confluence Bonus
+    if confluence_count >= 4:
+        score += 15
+        reasons.append(f"🔥 {confluence_count}x Confluences")
+    elif confluence_count >= 3:
+        score += 8
+    
+    return max(int(score), 0), reasons, features.rr, features.rvol, features.perf_30d, strategies
+
+def calculate_advanced_score(ticker, df, entry, sl, tp, market_bonus, sweep_type, indicators, mtf_frames=None, zones=None, found_fvg=False):
+    """Refined Scoring System (zones: an up-to-date ZoneStore, built from df when not given)"""
     try:
-        score = 50 + market_bonus
-        reasons = []
-        confluence_count = 0
-        
-        rsi, rvol, golden_cross, trend, perf_30d = indicators
-        
-        # 1. Order Block Confirmation (+25)
-        obs = identify_order_blocks(df)
-        if obs:
-            closest_ob = min(obs, key=lambda x: abs(entry - x['zone_high']))
-            distance_pct = abs(entry - closest_ob['zone_high']) / entry
-            
-            if distance_pct < 0.015:
-                bonus = int(25 * closest_ob['strength'])
-                score += bonus
-                confluence_count += 1
-                reasons.append(f"💎 Strong OB ({closest_ob['strength']:.2f}x)")
-        
-        # 2. Market Structure Break (+20)
-        has_bos, bos_strength, bos_type = detect_market_structure_break(df)
-        if has_bos:
-            score += 20
-            confluence_count += 1
-            reasons.append(f"🔥 {bos_type} (+{bos_strength:.1f}%)")
-        
-        # 3. Multi-Timeframe Confirmation (+15)
-        mtf_score, mtf_reasons = multi_timeframe_confirmation(ticker)
-        if mtf_score > 0:
-            score += mtf_score
-            confluence_count += 1
-            reasons.extend(mtf_reasons)
-        
-        # 4. Volume Analysis
-        curr_rvol = rvol.iloc[-1] if not pd.isna(rvol.iloc[-1]) else 1.0
-        
-        if curr_rvol > 2.5:
-            score += 20
-            confluence_count += 1
-            reasons.append(f"🚀 Huge Volume ({curr_rvol:.1f}x)")
-        elif curr_rvol > 1.8:
-            score += 15
-            confluence_count += 1
-            reasons.append(f"📊 Strong Volume ({curr_rvol:.1f}x)")
-        elif curr_rvol > 1.3:
-            score += 8
-            reasons.append(f"📊 Volume Up ({curr_rvol:.1f}x)")
-        
-        # 5. Sweep Confirmation
-        if sweep_type == "MAJOR":
-            score += 25
-            confluence_count += 1
-            reasons.append("🌊 Major Sweep (>20d)")
-        elif sweep_type == "MINOR":
-            score += 15
-            reasons.append("💧 Minor Sweep (>10d)")
-        
-        # 6. R:R Analysis
-        risk = entry - sl
-        reward = tp - entry
-        rr = reward / risk if risk > 0 else 0
-        
-        if rr >= 4.0:
-            score += 20
-            confluence_count += 1
-            reasons.append(f"💰 Insane R:R ({rr:.1f})")
-        elif rr >= 3.0:
-            score += 15
-            reasons.append(f"💰 Great R:R ({rr:.1f})")
-        elif rr >= 2.5:
-            score += 10
-            reasons.append(f"💰 Good R:R ({rr:.1f}R)")
-        elif rr >= 2.0:
-            score += 5
-        elif rr < 2.0:
-            score -= 15
-            reasons.append(f"⚠️ Low R:R ({rr:.1f})")
-        
-        # 7. RSI Zone
-        curr_rsi = rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50
-        
-        if 35 <= curr_rsi <= 45:
-            score += 18
-            confluence_count += 1
-            reasons.append(f"🎯 Golden RSI ({int(curr_rsi)})")
-        elif 40 <= curr_rsi <= 55:
-            score += 10
-            reasons.append(f"📉 RSI Pullback ({int(curr_rsi)})")
-        elif curr_rsi < 30:
-            score += 5
-        elif curr_rsi > 70:
-            score -= 20
-        elif curr_rsi > 65:
-            score -= 10
-        
-        # 8. Entry Proximity
-        curr_price = df['Close'].iloc[-1]
-        dist_pct = abs(curr_price - entry) / entry
-        
-        if dist_pct < 0.008:
-            score += 18
-            reasons.append("🎯 Perfect Sniper Entry")
-        elif dist_pct < 0.01:
-            score += 15
-            reasons.append("🎯 Buy Zone")
-        elif dist_pct < 0.02:
-            score += 8
-        elif dist_pct > 0.05:
-            score -= 12
-            reasons.append(f"⚠️ Price Chasing ({dist_pct*100:.1f}%)")
-        
-        # 9. Trend
-        if trend:
-            score += 5
-            reasons.append("📈 Long-term Uptrend")
-        
-        if golden_cross:
-            score += 10
-            confluence_count += 1
-            reasons.append("✨ Golden Cross")
-        
-        # 11. Market Condition
-        if market_bonus > 0:
-            reasons.append("🌍 Market Tailwind (+5)")
-        elif market_bonus < 0:
-            reasons.append("🌪️ Market Headwind (-10)")
-        
-        # 12. Confluence Bonus
-        if confluence_count >= 4:
-            score += 15
-            reasons.append(f"🔥 {confluence_count}x Confluences")
-        elif confluence_count >= 3:
-            score += 8
-        
-        # Calculate strategy count for return
-        if sweep_type: strategies += 1
-        if has_bos: strategies += 1
-        if mtf_score > 0: strategies += 1
-        if golden_cross: strategies += 1
-        
-        return max(int(score), 0), reasons, rr, curr_rvol, perf_30d, strategies
-        
+        features = build_features(ticker, df, entry, sl, tp, market_bonus, sweep_type, found_fvg, indicators, mtf_frames, zones)
+        return score_hits(features, run_strategies(features))
     except Exception as e:
+        swallowed("calculate_advanced_score")
         print(f"Scoring Error: {e}")
         return 50, [], 0, 0, 0, 0
 
+# 1. Order Block Confirmation (+25): closest unmitigated OB near the entry
+@register_strategy("order_block")
+def order_block_strategy(f):
+    obs = f.zones.active_near(f.entry, 0.015)
+    if obs:
+        closest_ob = min(obs, key=lambda x: abs(f.entry - x.zone_high))
+        distance_pct = abs(f.entry - closest_ob.zone_high) / f.entry
+        if distance_pct < 0.015:
+            return Hit(int(25 * closest_ob.strength), (f"💎 Strong OB ({closest_ob.strength:.2f}x)",), confluence=True)
+
+# 2. Market Structure Break (+20)
+@register_strategy("bos")
+def bos_strategy(f):
+    if f.recent is None:
+        return None
+    has_bos, bos_strength, bos_type = structure_break_from_arrays(*f.recent)
+    if has_bos:
+        return Hit(20, (f"🔥 {bos_type} (+{bos_strength:.1f}%)",), confluence=True, strategy=True)
+
+# 3. Multi-Timeframe Confirmation (+15)
+@register_strategy("mtf")
+def mtf_strategy(f):
+    mtf_score, mtf_reasons = multi_timeframe_confirmation(f.ticker, f.mtf_frames)
+    if mtf_score > 0:
+        return Hit(mtf_score, tuple(mtf_reasons), confluence=True, strategy=True)
+
+# 4. Volume Analysis
+@register_strategy("volume")
+def volume_strategy(f):
+    if f.rvol > 2.5:
+        return Hit(20, (f"🚀 Huge Volume ({f.rvol:.1f}x)",), confluence=True)
+    elif f.rvol > 1.8:
+        return Hit(15, (f"📊 Strong Volume ({f.rvol:.1f}x)",), confluence=True)
+    elif f.rvol > 1.3:
+        return Hit(8, (f"📊 Volume Up ({f.rvol:.1f}x)",))
+
+# 5. Sweep Confirmation (setup)
+@register_strategy("sweep")
+def sweep_strategy(f):
+    if f.sweep_type == "MAJOR":
+        return Hit(25, ("🌊 Major Sweep (>20d)",), confluence=True, strategy=True, setup=True)
+    elif f.sweep_type == "MINOR":
+        return Hit(15, ("💧 Minor Sweep (>10d)",), strategy=True, setup=True)
+
+# Fair Value Gap entry (setup only, no points)
+@register_strategy("fvg")
+def fvg_strategy(f):
+    if f.found_fvg:
+        return Hit(setup=True)
+
+# 6. R:R Analysis
+@register_strategy("risk_reward")
+def risk_reward_strategy(f):
+    rr = f.rr
+    if rr >= 4.0:
+        return Hit(20, (f"💰 Insane R:R ({rr:.1f})",), confluence=True)
+    elif rr >= 3.0:
+        return Hit(15, (f"💰 Great R:R ({rr:.1f})",))
+    elif rr >= 2.5:
+        return Hit(10, (f"💰 Good R:R ({rr:.1f}R)",))
+    elif rr >= 2.0:
+        return Hit(5)
+    return Hit(-15, (f"⚠️ Low R:R ({rr:.1f})",))
+
+# 7. RSI Zone
+@register_strategy("rsi")
+def rsi_strategy(f):
+    curr_rsi = f.rsi
+    if 35 <= curr_rsi <= 45:
+        return Hit(18, (f"🎯 Golden RSI ({int(curr_rsi)})",), confluence=True)
+    elif 40 <= curr_rsi <= 55:
+        return Hit(10, (f"📉 RSI Pullback ({int(curr_rsi)})",))
+    elif curr_rsi < 30:
+        return Hit(5)
+    elif curr_rsi > 70:
+        return Hit(-20)
+    elif curr_rsi > 65:
+        return Hit(-10)
+
+# 8. Entry Proximity
+@register_strategy("entry_proximity")
+def entry_proximity_strategy(f):
+    dist_pct = abs(f.price - f.entry) / f.entry
+    if dist_pct < 0.008:
+        return Hit(18, ("🎯 Perfect Sniper Entry",))
+    elif dist_pct < 0.01:
+        return Hit(15, ("🎯 Buy Zone",))
+    elif dist_pct < 0.02:
+        return Hit(8)
+    elif dist_pct > 0.05:
+        return Hit(-12, (f"⚠️ Price Chasing ({dist_pct*100:.1f}%)",))
+
+# 9. Trend
+@register_strategy("trend")
+def trend_strategy(f):
+    if f.trend:
+        return Hit(5, ("📈 Long-term Uptrend",))
+
+@register_strategy("golden_cross")
+def golden_cross_strategy(f):
+    if f.golden_cross:
+        return Hit(10, ("✨ Golden Cross",), confluence=True, strategy=True)
+
+# 11. Market Condition (the bonus itself is in the base score)
+@register_strategy("market")
+def market_strategy(f):
+    if f.market_bonus > 0:
+        return Hit(reasons=("🌍 Market Tailwind (+5)",))
+    elif f.market_bonus < 0:
+        return Hit(reasons=("🌪️ Market Headwind (-10)",))
+
 # ==================== 15. 🔥 SMC Calculation V2 ====================
 def calculate_smc_v2(df):
     """SMC Core Calculation - Optimized"""
@@ -636,11 +1460,13 @@ def calculate_smc_v2(df):
         return bsl, ssl, eq, best_entry, sl, found_fvg, sweep_type
         
     except Exception as e:
+        swallowed("calculate_smc_v2")
         print(f"SMC Error: {e}")
         try:
             last = float(df['Close'].iloc[-1])
             return last*1.05, last*0.95, last, last, last*0.94, False, None
         except:
+            swallowed("calculate_smc_v2")
             return 0, 0, 0, 0, 0, False, None
 
 # ==================== 16. Charting Core ====================
@@ -656,13 +1482,14 @@ def create_error_image(msg):
     buf.seek(0)
     return f"data:image/png;base64,{base64.b64encode(buf.read()).decode('utf-8')}"
 
+@timed("chart.png")
 def generate_chart(df, ticker, title, entry, sl, tp, is_wait, sweep_type):
     try:
         plt.close('all')
         if df is None or len(df) < 5: 
             return create_error_image("No Data")
         
-        plot_df = df.tail(80).copy()
+        plot_df = df.tail(CHART_BARS).copy()
         entry = float(entry) if not np.isnan(entry) else plot_df['Close'].iloc[-1]
         sl = float(sl) if not np.isnan(sl) else plot_df['Low'].min()
         tp = float(tp) if not np.isnan(tp) else plot_df['High'].max()
@@ -707,340 +1534,847 @@ def generate_chart(df, ticker, title, entry, sl, tp, is_wait, sweep_type):
         buf.seek(0)
         return f"data:image/png;base64,{base64.b64encode(buf.read()).decode('utf-8')}"
     except Exception as e: 
+        swallowed("generate_chart")
         print(f"Plot Error: {e}")
         return create_error_image("Plot Error")
 
-# ==================== 17. Discord Alerts ====================
-def send_discord_alert(results):
-    if not DISCORD_WEBHOOK: return
-    top_picks = [r for r in results if r['score'] >= 80 and r['signal'] == "LONG"][:3]
-    if not top_picks: return
-    
-    print(f"🚀 Sending alerts for: {[p['ticker'] for p in top_picks]}")
-    embeds = []
-    for pick in top_picks:
-        data = pick['data']
-        embed = {
-            "title": f"🚀 {pick['ticker']} - Strong Buy Setup",
-            "description": f"**Score: {pick['score']}** | Vol: {data['rvol']:.1f}x",
-            "color": 5763717,
-            "fields": [
-                {"name": "Entry", "value": f"${data['entry']:.2f}", "inline": True},
-                {"name": "Stop Loss", "value": f"${data['sl']:.2f}", "inline": True},
-                {"name": "Target", "value": f"${pick['price'] * 1.2:.2f}", "inline": True},
-                {"name": "Status", "value": "✅ LONG", "inline": True}
-            ],
-            "footer": {"text": "Daily Dip Pro • Advanced SMC Strategy"}
+# Client-side chart mode: ship the same window as compact ints and draw it in the browser
+CHART_BARS = 80
+CHART_PRICE_STEPS = 4000  # Price quantization levels across the window's high-low range
+
+@timed("chart.canvas")
+def build_chart_payload(df, ticker, title, entry, sl, tp, is_wait, sweep_type):
+    """Quantized OHLCV + levels for static/chart.js (same window as generate_chart)"""
+    try:
+        if df is None or len(df) < 5:
+            return {"error": "No Data"}
+        
+        plot_df = df.tail(CHART_BARS).dropna(subset=['Open', 'High', 'Low', 'Close'])
+        opens = plot_df['Open'].to_numpy(dtype=float)
+        highs = plot_df['High'].to_numpy(dtype=float)
+        lows = plot_df['Low'].to_numpy(dtype=float)
+        closes = plot_df['Close'].to_numpy(dtype=float)
+        volumes = np.nan_to_num(plot_df['Volume'].to_numpy(dtype=float))
+        ma50 = pd.Series(closes).rolling(50).mean().to_numpy()  # mav=50 over the window, like mplfinance
+        
+        entry = float(entry) if not np.isnan(entry) else closes[-1]
+        sl = float(sl) if not np.isnan(sl) else lows.min()
+        tp = float(tp) if not np.isnan(tp) else highs.max()
+        
+        p0 = float(lows.min())
+        q = (float(highs.max()) - p0) / CHART_PRICE_STEPS or 0.01
+        enc = lambda a: np.rint((a - p0) / q).astype(int).tolist()
+        vmax = float(volumes.max()) or 1.0
+        
+        return {
+            "title": f"{ticker} - {title}",
+            "p0": round(p0, 6), "q": round(q, 8),
+            "o": enc(opens), "h": enc(highs), "l": enc(lows), "c": enc(closes),
+            "v": np.rint(volumes / vmax * 255).astype(int).tolist(),
+            "ma": [None if np.isnan(m) else int(round((m - p0) / q)) for m in ma50],
+            "d": [plot_df.index[0].strftime('%m-%d'), plot_df.index[-1].strftime('%m-%d')],
+            "entry": round(entry, 4), "sl": round(sl, 4), "tp": round(tp, 4),
+            "wait": bool(is_wait), "sweep": sweep_type,
         }
-        embeds.append(embed)
-    
+    except Exception as e:
+        swallowed("build_chart_payload")
+        print(f"Chart Payload Error: {e}")
+        return {"error": "Plot Error"}
+
+# ==================== 17. Discord Alerts ====================
+# alerts.json is committed by the workflow like history.json, so a setup already alerted
+# today (same ticker / entry / SL) is not re-sent by the next push-triggered run.
+ALERT_LEDGER_FILE = "alerts.json"
+ALERT_LEDGER_DAYS = 14     # Ledger entries older than this are pruned
+ALERT_MAX_PICKS = int(os.environ.get("ALERT_MAX_PICKS", "3"))
+DISCORD_MAX_EMBEDS = 10    # Discord's per-message embed limit
+DISCORD_WEBHOOKS = [u.strip() for u in DISCORD_WEBHOOK.split(",") if u.strip()]  # Comma-separated destinations
+
+def load_alert_ledger():
+    if os.path.exists(ALERT_LEDGER_FILE):
+        try:
+            with open(ALERT_LEDGER_FILE, "r") as f:
+                return json.load(f)
+        except:
+            swallowed("load_alert_ledger")
+            return {}
+    return {}
+
+def save_alert_ledger(ledger):
+    cutoff = (datetime.now() - timedelta(days=ALERT_LEDGER_DAYS)).strftime('%Y-%m-%d')
+    ledger = {k: v for k, v in ledger.items() if v >= cutoff}
     try:
-        requests.post(DISCORD_WEBHOOK, json={"username": "Daily Dip Bot", "embeds": embeds})
-    except Exception as e: 
+        with open(ALERT_LEDGER_FILE, "w") as f:
+            json.dump(ledger, f, indent=4, sort_keys=True)
+    except Exception as e:
+        swallowed("save_alert_ledger")
+        print(f"❌ Failed to save alert ledger: {e}")
+
+def alert_key(pick, day):
+    return f"{pick.ticker}|{pick.entry:.2f}|{pick.sl:.2f}|{day}"
+
+def build_alert_embed(pick):
+    return {
+        "title": f"🚀 {pick.ticker} - Strong Buy Setup",
+        "description": f"**Score: {pick.score}** | Vol: {pick.rvol:.1f}x",
+        "color": 5763717,
+        "fields": [
+            {"name": "Entry", "value": f"${pick.entry:.2f}", "inline": True},
+            {"name": "Stop Loss", "value": f"${pick.sl:.2f}", "inline": True},
+            {"name": "Target", "value": f"${pick.price * 1.2:.2f}", "inline": True},
+            {"name": "Status", "value": "✅ LONG", "inline": True}
+        ],
+        "footer": {"text": "Daily Dip Pro • Advanced SMC Strategy"}
+    }
+
+def post_discord_batch(webhook, embeds):
+    """One message to one destination. True when Discord accepted it"""
+    try:
+        count("net.discord")
+        with span("net.discord.post"):
+            resp = http_request("POST", webhook, json={"username": "Daily Dip Bot", "embeds": embeds})
+        if resp.status_code >= 400:
+            print(f"❌ Discord rejected the alert: HTTP {resp.status_code} {resp.text[:200]}")
+            return False
+        return True
+    except Exception as e:
+        swallowed("post_discord_batch")
         print(f"❌ Failed to send Discord alert: {e}")
+        return False
+
+def send_discord_alert(results, force=False):
+    if not DISCORD_WEBHOOKS: return
+    today_str = datetime.now().strftime('%Y-%m-%d')
+    ledger = load_alert_ledger()
+    top_picks = [r for r in results if r.score >= 80 and r.signal == "LONG"][:ALERT_MAX_PICKS]
+    new_picks = [p for p in top_picks if force or alert_key(p, today_str) not in ledger]
+    count("alerts.suppressed", len(top_picks) - len(new_picks))
+    if not new_picks:
+        if top_picks:
+            print(f"🔕 Alerts already sent today for: {[p.ticker for p in top_picks]}")
+        return
+    
+    print(f"🚀 Sending alerts for: {[p.ticker for p in new_picks]}")
+    batches = [new_picks[i:i + DISCORD_MAX_EMBEDS] for i in range(0, len(new_picks), DISCORD_MAX_EMBEDS)]
+    jobs = [(webhook, batch) for batch in batches for webhook in DISCORD_WEBHOOKS]
+    with ThreadPoolExecutor(max_workers=min(len(jobs), 8)) as pool:
+        sent = list(pool.map(lambda job: post_discord_batch(job[0], [build_alert_embed(p) for p in job[1]]), jobs))
+    
+    # A pick counts as alerted once any destination took it, so a dead webhook can't cause repeats elsewhere
+    for (_, batch), ok in zip(jobs, sent):
+        if ok:
+            for pick in batch:
+                ledger[alert_key(pick, today_str)] = today_str
+    count("alerts.sent", len({pick.ticker for (_, batch), ok in zip(jobs, sent) if ok for pick in batch}))
+    save_alert_ledger(ledger)
 
 # ==================== 18. Ticker Processing ====================
-def process_ticker(t, app_data_dict, market_bonus):
-    try:
+# Each ticker moves through four stages: fetch (network) -> analyze (SMC/scoring)
+# -> render (charts) -> fragment (modal HTML). The streaming pipeline in section 20
+# overlaps them across tickers; `analyze` in section 23 runs fetch + analyze for one.
+@dataclass(slots=True)
+class TickerResult:
+    """One analysed ticker: the result row, Discord alert source and modal shard in one record"""
+    ticker: str
+    price: float
+    signal: str
+    wait_reason: str
+    entry: float
+    sl: float
+    tp: float
+    sweep_type: str | None
+    score: int
+    reasons: list
+    rr: float
+    rvol: float
+    perf: float
+    strategies: int
+    earn: str
+    sector: str
+    deploy: str = ""
+    chart_d: object = None  # PNG data URI or canvas payload, depending on CHART_MODE
+    chart_h: object = None
+    news: list = None  # Ticker headlines from get_ticker_news()
+    rs: int | None = None            # Relative strength rank vs SPY across today's tickers (0-100)
+    rs_sector: float | None = None   # 3M return vs own sector, %
+
+    @property
+    def cls(self):
+        return "b-long" if self.signal == "LONG" else "b-wait"
+
+    def to_shard(self):
+        """JSON payload openModal() fetches from data/t/<TICKER>.json"""
+        chart_keys = ("chart_d", "chart_h") if CHART_MODE == "canvas" else ("img_d", "img_h")
+        return {"signal": self.signal, "wait_reason": self.wait_reason, "deploy": self.deploy,
+                chart_keys[0]: self.chart_d, chart_keys[1]: self.chart_h,
+                "score": self.score, "rvol": self.rvol, "entry": self.entry, "sl": self.sl,
+                "news": self.news or []}
+
+@ticker_stage("ticker.fetch")
+def fetch_ticker_inputs(t, df_d=None, sector=None):
+    """Network stage: download everything the analysis needs for one ticker"""
+    if df_d is None:
         df_d = fetch_data_safe(t, "1y", "1d")
-        if df_d is None or len(df_d) < 50: 
+        if df_d is not None and not passes_quality_gate(t, df_d):
             return None
-        
-        df_h = fetch_data_safe(t, "1mo", "1h")
-        if df_h is None or df_h.empty: 
-            df_h = df_d
-        
-        curr = float(df_d['Close'].iloc[-1])
-        sma200 = float(df_d['Close'].rolling(200).mean().iloc[-1])
-        if pd.isna(sma200): 
-            sma200 = curr
-        
-        # 1. SMC V2 Calc
+    if df_d is None or len(df_d) < 50:
+        return None
+
+    df_h = fetch_data_safe(t, "1mo", "1h")
+    if df_h is None or df_h.empty:
+        df_h = df_d
+
+    return {
+        "df_d": df_d,
+        "df_h": df_h,
+        "mtf_frames": fetch_mtf_frames(t),
+        "earn": check_earnings(t),
+        "sector": sector if sector is not None else get_stock_sector(t),
+        "news": get_ticker_news(t),
+    }
+
+@ticker_stage("ticker.analyze")
+def analyze_ticker(t, inputs, market_bonus, indicators=None):
+    """CPU stage: SMC levels, signal and score (indicators: precomputed, e.g. from an IndicatorState)"""
+    df_d = inputs['df_d']
+    curr = float(df_d['Close'].iloc[-1])
+    sma200 = float(df_d['Close'].rolling(200).mean().iloc[-1])
+    if pd.isna(sma200): 
+        sma200 = curr
+    
+    # 1. SMC V2 Calc
+    with span("ticker.smc"):
         bsl, ssl, eq, entry, sl, found_fvg, sweep_type = calculate_smc_v2(df_d)
-        tp = bsl
-        
-        earnings_warning = check_earnings(t) 
-        
-        # 🔥 V8 Update: Relaxed Trend Filter (Price > 200MA)
-        is_bullish = curr > sma200
-        in_discount = curr < eq
-        
+    tp = bsl
+    
+    if indicators is None:
+        with span("ticker.indicators"):
+            indicators = calculate_indicators(df_d)
+    
+    # Persistent zone store: only the bars since the last run are scanned
+    with span("ticker.zones"):
+        zones = inputs.get('zones') or ZoneStore.load(t)
+        inputs['zones'] = zones.update(df_d)
+        zones.save()
+    
+    # 2. All strategy detectors in one pass
+    with span("ticker.score"):
+        features = build_features(t, df_d, entry, sl, tp, market_bonus, sweep_type, found_fvg, indicators, inputs['mtf_frames'], zones)
+        hits = run_strategies(features)
+        score, reasons, rr, rvol, perf_30d, strategies = score_hits(features, hits)
+    
+    # 🔥 V8 Update: Relaxed Trend Filter (Price > 200MA)
+    is_bullish = curr > sma200
+    in_discount = curr < eq
+    
+    wait_reason = ""
+    signal = "WAIT"
+    
+    if not is_bullish: 
+        wait_reason = "📉 Downtrend"
+    elif not in_discount: 
+        wait_reason = "💸 Premium"
+    elif not any(hit.setup for _, hit in hits): 
+        wait_reason = "💤 No Setup"
+    else:
+        signal = "LONG"
         wait_reason = ""
-        signal = "WAIT"
-        
-        if not is_bullish: 
-            wait_reason = "📉 Downtrend"
-        elif not in_discount: 
-            wait_reason = "💸 Premium"
-        elif not (found_fvg or sweep_type): 
-            wait_reason = "💤 No Setup"
-        else:
-            signal = "LONG"
-            wait_reason = ""
-
-        indicators = calculate_indicators(df_d)
-        
-        # 2. Advanced Scoring
-        score, reasons, rr, rvol, perf_30d, strategies = calculate_advanced_score(t, df_d, entry, sl, tp, market_bonus, sweep_type, indicators)
-        
-        is_wait = (signal == "WAIT")
-        img_d = generate_chart(df_d, t, "Daily SMC", entry, sl, tp, is_wait, sweep_type)
-        img_h = generate_chart(df_h, t, "Hourly Entry", entry, sl, tp, is_wait, sweep_type)
-        cls = "b-long" if signal == "LONG" else "b-wait"
-        
-        # HTML Content
+    
+    return TickerResult(
+        ticker=t, price=curr, signal=signal, wait_reason=wait_reason,
+        entry=float(entry), sl=float(sl), tp=float(tp), sweep_type=sweep_type,
+        score=score, reasons=reasons, rr=float(rr), rvol=float(rvol), perf=float(perf_30d), strategies=strategies,
+        earn=inputs['earn'], sector=inputs['sector'], news=inputs.get('news'))
+
+@ticker_stage("ticker.render")
+def render_ticker_charts(t, inputs, r):
+    """Render stage: daily + hourly charts. PNG mode is not thread-safe (pyplot state), run on one worker"""
+    is_wait = (r.signal == "WAIT")
+    if CHART_MODE == "canvas":
+        chart_d = build_chart_payload(inputs['df_d'], t, "Daily SMC", r.entry, r.sl, r.tp, is_wait, r.sweep_type)
+        chart_h = build_chart_payload(inputs['df_h'], t, "Hourly Entry", r.entry, r.sl, r.tp, is_wait, r.sweep_type)
+        return chart_d, chart_h
+    img_d = generate_chart(inputs['df_d'], t, "Daily SMC", r.entry, r.sl, r.tp, is_wait, r.sweep_type)
+    img_h = generate_chart(inputs['df_h'], t, "Hourly Entry", r.entry, r.sl, r.tp, is_wait, r.sweep_type)
+    return img_d, img_h
+
+@ticker_stage("ticker.fragment")
+def build_ticker_fragment(t, r, charts, app_data_dict):
+    """Fragment stage: fill in modal HTML + charts and register the record in APP_DATA"""
+    curr, signal, wait_reason = r.price, r.signal, r.wait_reason
+    entry, sl, tp, sweep_type = r.entry, r.sl, r.tp, r.sweep_type
+    score, reasons, rr, rvol, strategies = r.score, r.reasons, r.rr, r.rvol, r.strategies
+    earnings_warning = r.earn
+    
+    # HTML Content
+    earn_html = tpl('earnings').substitute(earn=earnings_warning) if earnings_warning else ""
+    if signal == "LONG":
         elite_html = ""
         if score >= 80 or sweep_type or rvol > 1.5:
-            reasons_html = "".join([f"<li style='margin-bottom:4px;'>✅ {r}</li>" for r in reasons])
-            confluence_text = f"🔥 <b>Strategies:</b> {strategies} Signals" if strategies >= 2 else ""
-            
-            sweep_text = ""
-            if sweep_type == "MAJOR":
-                sweep_text = "<div style='margin-top:10px;padding:10px;background:rgba(239,68,68,0.15);border-radius:6px;border-left:4px solid #ef4444;color:#fca5a5;font-size:0.85rem;'><b>🌊 Major Sweep</b><br>Reclaimed 20d low. Institutional footprint detected.</div>"
-            elif sweep_type == "MINOR":
-                sweep_text = "<div style='margin-top:10px;padding:10px;background:rgba(251,191,36,0.15);border-radius:6px;border-left:4px solid #fbbf24;color:#fcd34d;font-size:0.85rem;'><b>💧 Minor Sweep</b><br>Reclaimed 10d low. Short-term reversal likely.</div>"
-            
+            reason_item = tpl('reason_item')
+            sweep_text = tpl('sweep_major').template if sweep_type == "MAJOR" else (tpl('sweep_minor').template if sweep_type == "MINOR" else "")
             # 🔥 V8 Update: Crypto Risk Warning
-            risk_warning = ""
-            if t in CRYPTO_TICKERS:
-                risk_warning = "<div style='margin-top:10px;padding:10px;background:rgba(124, 58, 237, 0.15);border-radius:6px;border-left:4px solid #7c3aed;color:#d8b4fe;font-size:0.85rem;'><b>⚠️ Crypto Sector Risk</b><br>Max portfolio allocation: 20%. High volatility alert.</div>"
-            
-            elite_html = f"<div style='background:#1e293b; border:1px solid #334155; padding:15px; border-radius:12px; margin:15px 0; box-shadow: 0 4px 6px rgba(0,0,0,0.2);'><div style='font-weight:bold; color:#10b981; font-size:1.1rem; margin-bottom:8px;'>💎 AI Analysis (Score {score})</div><div style='font-size:0.9rem; color:#cbd5e1; margin-bottom:10px;'>{confluence_text}</div><ul style='margin:0; padding-left:20px; font-size:0.85rem; color:#94a3b8; line-height:1.5;'>{reasons_html}</ul>{sweep_text}{risk_warning}</div>"
-        
-        stats_dashboard = f"<div style='display:grid; grid-template-columns: 1fr 1fr 1fr; gap:10px; margin-bottom:15px;'><div style='background:#334155; padding:10px; border-radius:8px; text-align:center;'><div style='font-size:0.75rem; color:#94a3b8; margin-bottom:2px;'>Current</div><div style='font-size:1.2rem; font-weight:900; color:#f8fafc;'>${curr:.2f}</div></div><div style='background:rgba(16,185,129,0.15); padding:10px; border-radius:8px; text-align:center; border:1px solid #10b981;'><div style='font-size:0.75rem; color:#10b981; margin-bottom:2px;'>Target (TP)</div><div style='font-size:1.2rem; font-weight:900; color:#10b981;'>${tp:.2f}</div></div><div style='background:rgba(251,191,36,0.15); padding:10px; border-radius:8px; text-align:center; border:1px solid #fbbf24;'><div style='font-size:0.75rem; color:#fbbf24; margin-bottom:2px;'>R:R</div><div style='font-size:1.2rem; font-weight:900; color:#fbbf24;'>{rr:.1f}R</div></div></div>"
-
+            risk_warning = tpl('crypto_risk').template if t in CRYPTO_TICKERS else ""
+            elite_html = tpl('elite').substitute(
+                score=score,
+                confluence_text=f"🔥 <b>Strategies:</b> {strategies} Signals" if strategies >= 2 else "",
+                reasons="".join(reason_item.substitute(reason=r) for r in reasons),
+                sweep_note=sweep_text, risk_note=risk_warning)
+        
+        stats_dashboard = tpl('stats').substitute(curr=f"{curr:.2f}", tp=f"{tp:.2f}", rr=f"{rr:.1f}")
         # 🔥 V8 Update: Default Risk to 1.5% in Calculator HTML
-        calculator_html = f"<div style='background:#334155; padding:15px; border-radius:12px; margin-top:20px; border:1px solid #475569;'><div style='font-weight:bold; color:#f8fafc; margin-bottom:10px; display:flex; align-items:center;'>🧮 Risk Calculator <span style='font-size:0.7rem; color:#94a3b8; margin-left:auto;'>(V8 Optimized: 1.5%)</span></div><div style='display:flex; gap:10px; margin-bottom:10px;'><div style='flex:1;'><div style='font-size:0.7rem; color:#94a3b8; margin-bottom:4px;'>Account ($)</div><input type='number' id='calc-capital' placeholder='10000' style='width:100%; padding:8px; border-radius:6px; border:none; background:#1e293b; color:white; font-weight:bold;'></div><div style='flex:1;'><div style='font-size:0.7rem; color:#94a3b8; margin-bottom:4px;'>Risk (%)</div><input type='number' id='calc-risk' placeholder='1.5' value='1.5' style='width:100%; padding:8px; border-radius:6px; border:none; background:#1e293b; color:white; font-weight:bold;'></div></div><div style='background:#1e293b; padding:10px; border-radius:8px; display:flex; justify-content:space-between; align-items:center;'><div style='font-size:0.8rem; color:#94a3b8;'>Shares:</div><div id='calc-result' style='font-size:1.2rem; font-weight:900; color:#fbbf24;'>0</div></div><div style='text-align:right; font-size:0.7rem; color:#64748b; margin-top:5px;'>Based on SL: ${sl:.2f}</div></div>"
+        calculator_html = tpl('calculator').substitute(sl=f"{sl:.2f}")
+        ai_html = tpl('deploy_long').substitute(
+            earnings=earn_html, stats=stats_dashboard, elite=elite_html, calculator=calculator_html,
+            entry=f"{entry:.2f}", sl=f"{sl:.2f}")
+    else:
+        ai_html = tpl('deploy_wait').substitute(wait_reason=wait_reason, earnings=earn_html)
+        
+    r.deploy = ai_html
+    r.chart_d, r.chart_h = charts
+    app_data_dict[t] = r
+    return r
 
-        earn_html = ""
-        if earnings_warning:
-            earn_html = f"<div style='background:rgba(239,68,68,0.2); color:#fca5a5; padding:8px; border-radius:6px; font-weight:bold; margin-bottom:10px; text-align:center; border:1px solid #ef4444;'>💣 {earnings_warning}</div>"
+# ==================== 19. HTML Templates ====================
+TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "site.html")
+STATIC_DIR = "static"
+DATA_DIR = "data"
+RESULTS_FILE = os.path.join(CACHE_DIR, "results.json")
+_TEMPLATES = {}
 
-        if signal == "LONG":
-            ai_html = f"<div class='deploy-box long' style='border:none; padding:0;'><div class='deploy-title' style='color:#10b981; font-size:1.3rem; margin-bottom:15px;'>✅ LONG SETUP</div>{earn_html}{stats_dashboard}{elite_html}{calculator_html}<div style='background:#1e293b; padding:12px; border-radius:8px; margin-top:10px; display:flex; justify-content:space-between; font-family:monospace; color:#cbd5e1;'><span>🔵 Entry: ${entry:.2f}</span><span style='color:#ef4444;'>🔴 SL: ${sl:.2f}</span></div></div>"
-        else:
-            ai_html = f"<div class='deploy-box wait' style='background:#1e293b; border:1px solid #555;'><div class='deploy-title' style='color:#94a3b8;'>⏳ WAIT: {wait_reason}</div>{earn_html}<div style='padding:10px; color:#cbd5e1;'>No valid setup currently. Reason: {wait_reason}</div></div>"
-            
-        app_data_dict[t] = {"signal": signal, "wait_reason": wait_reason, "deploy": ai_html, "img_d": img_d, "img_h": img_h, "score": score, "rvol": rvol, "entry": entry, "sl": sl}
-        return {"ticker": t, "price": curr, "signal": signal, "wait_reason": wait_reason, "cls": cls, "score": score, "rvol": rvol, "perf": perf_30d, "data": {"entry": entry, "sl": sl, "rvol": rvol}, "earn": earnings_warning, "sector": get_stock_sector(t)}
-    except Exception as e:
-        print(f"Err {t}: {e}")
-        return None
+def tpl(name):
+    """Precompiled fragment from templates/site.html (parsed once per process)"""
+    if not _TEMPLATES:
+        with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
+            chunks = re.split(r"^<!-- \[(\w+)\] -->\n", f.read(), flags=re.M)
+        for frag_name, body in zip(chunks[1::2], chunks[2::2]):
+            _TEMPLATES[frag_name] = Template(body.strip("\n"))
+    return _TEMPLATES[name]
 
-# ==================== 19. Main Execution ====================
-def main():
-    print("🚀 Starting Super Screener (SMC V2 Optimized)...")
-    weekly_news_html = get_polygon_news()
-    market_status, market_text, market_bonus = get_market_condition()
+def static_href(name):
+    """Relative URL of a static asset with a content hash, so the host can cache it forever"""
+    path = os.path.join(STATIC_DIR, name)
+    try:
+        with open(path, "rb") as f:
+            digest = hashlib.md5(f.read()).hexdigest()[:8]
+        return f"{STATIC_DIR}/{name}?v={digest}"
+    except OSError:
+        return f"{STATIC_DIR}/{name}"
+
+def precompress(path):
+    """Write .gz (and .br when brotli is installed) next to an output for the static host"""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(raw, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(raw))
+    except OSError as e:
+        print(f"⚠️ Precompress failed for {path}: {e}")
+
+@timed("stage.shards")
+def write_data_shards(app_data, processed_results, build_id):
+    """data/index.json for the grid + data/t/<TICKER>.json per modal"""
+    shard_dir = os.path.join(DATA_DIR, "t")
+    os.makedirs(shard_dir, exist_ok=True)
     
-    # 🔥 FIX 2: Define market_color properly
-    market_color = "#10b981" if market_status == "BULLISH" else ("#ef4444" if market_status == "BEARISH" else "#fbbf24")
+    index = {}
+    for r in processed_results:
+        t = r.ticker
+        if t not in app_data: continue
+        payload = json.dumps(r.to_shard(), separators=(",", ":"))
+        path = os.path.join(shard_dir, f"{t}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        precompress(path)
+        index[t] = {"signal": r.signal, "score": r.score, "rvol": round(r.rvol, 2),
+                    "sector": r.sector, "v": hashlib.md5(payload.encode("utf-8")).hexdigest()[:8]}
     
-    APP_DATA = {}
-    candidates_data = auto_select_candidates()
-    processed_results = []
+    # Drop shards of tickers that are no longer on the page
+    for fname in os.listdir(shard_dir):
+        if fname.split(".json")[0] not in index:
+            os.remove(os.path.join(shard_dir, fname))
     
-    for item in candidates_data:
-        t = item['ticker']
-        res = process_ticker(t, APP_DATA, market_bonus)
-        if res:
-            processed_results.append(res)
-            
-    processed_results.sort(key=lambda x: x['score'], reverse=True)
+    index_path = os.path.join(DATA_DIR, "index.json")
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"build": build_id, "tickers": index}, f, separators=(",", ":"))
+    precompress(index_path)
+    print(f"✅ {len(index)} data shards written")
+
+def write_sector_blocks(out, sector_groups, app_data, sector_stats=None):
+    if not sector_groups:
+        out.write(tpl('no_sectors').template)
+        return
     
-    # History
+    card, badge_long, badge_wait, earn_tpl = tpl('card'), tpl('badge_long').template, tpl('badge_wait'), tpl('earn_badge')
+    rs_tpl, sector_stats_tpl = tpl('rs_badge'), tpl('sector_stats')
+    sector_stats = sector_stats or {}
+    for sec_name, items in sector_groups.items():
+        items.sort(key=lambda x: x.score, reverse=True)
+        stats = sector_stats.get(sec_name)
+        out.write(tpl('sector_open').substitute(
+            sector=sec_name,
+            stats=sector_stats_tpl.substitute(rs=stats['rs'] if stats['rs'] is not None else "-", ret=f"{stats['ret']:+.1f}",
+                                              vs_spy=f"{stats['vs_spy']:+.1f}") if stats else ""))
+        for item in items:
+            t = item.ticker
+            if t not in app_data: continue
+            rvol_val = item.rvol
+            out.write(card.substitute(
+                ticker=t,
+                badge=badge_wait.substitute(reason=item.wait_reason) if item.signal == 'WAIT' else badge_long,
+                earn_badge=earn_tpl.substitute(earn=item.earn) if item.earn else "",
+                score=item.score, score_color='#10b981' if item.score >= 85 else '#3b82f6',
+                rs_badge=rs_tpl.substitute(rs=item.rs, rs_color='#10b981' if item.rs >= 80 else '#94a3b8',
+                                           vs_sector=f" · {item.rs_sector:+.1f}% vs sector" if item.rs_sector is not None else "") if item.rs is not None else "",
+                rvol=f"{rvol_val:.1f}",
+                rvol_color='#f472b6' if rvol_val > 1.5 else ('#fbbf24' if rvol_val > 1.2 else '#64748b'),
+                rvol_icon=' 🔥' if rvol_val > 1.5 else (' ⚡' if rvol_val > 1.2 else '')))
+        out.write("</div>")
+
+# ==================== 20. Streaming Pipeline ====================
+PIPELINE_QUEUE_SIZE = 8  # Max tickers buffered between two stages (backpressure)
+FETCH_WORKERS = 6        # Concurrent screen + download workers
+ANALYZE_WORKERS = 4      # Tickers scored in parallel (numpy / pandas release the GIL for much of it)
+
+async def _run_stage(workers, out_q, consumers=1):
+    """Wait for a stage's workers, then tell each worker of the next stage no more items are coming"""
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for _ in range(consumers):
+            await out_q.put(None)
+
+async def run_pipeline(app_data_dict, market_task, returns=None):
+    """Screen -> fetch -> analyze -> render -> fragment, with bounded queues between stages.
+    returns: optional dict filled with daily returns per analysed ticker (+ BENCHMARK)"""
+    print("🚀 Starting Super Screener (Priority First)...")
+    loop = asyncio.get_running_loop()
+    render_pool = ThreadPoolExecutor(max_workers=1)  # pyplot is not thread-safe
+    spy_returns = await asyncio.to_thread(get_spy_returns)
+    if returns is not None and len(spy_returns) > 0:
+        returns[BENCHMARK] = spy_returns
+    
+    universe = asyncio.Queue()
+    for t in get_screen_universe():
+        universe.put_nowait(t)
+    fetched = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    analyzed = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    rendered = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    results = []
+    
+    async def fetch_worker():
+        while not universe.empty():
+            t = universe.get_nowait()
+            screened = await asyncio.to_thread(screen_ticker, t, spy_returns)
+            if not screened:
+                continue
+            item, df_d = screened
+            try:
+                inputs = await asyncio.to_thread(fetch_ticker_inputs, t, df_d, item['sector'])
+            except Exception as e:
+                swallowed("fetch_worker")
+                print(f"Err {t}: {e}")
+                continue
+            if inputs:
+                await fetched.put((t, inputs))
+    
+    async def analyze_worker():
+        _, _, market_bonus = await market_task
+        while (job := await fetched.get()) is not None:
+            t, inputs = job
+            try:
+                result = await asyncio.to_thread(analyze_ticker, t, inputs, market_bonus)
+            except Exception as e:
+                swallowed("analyze_worker")
+                print(f"Err {t}: {e}")
+                continue
+            if returns is not None:
+                returns[t] = inputs['df_d']['Close'].pct_change().dropna()
+            await analyzed.put((t, inputs, result))
+    
+    async def render_worker():
+        while (job := await analyzed.get()) is not None:
+            t, inputs, result = job
+            try:
+                charts = await loop.run_in_executor(render_pool, render_ticker_charts, t, inputs, result)
+            except Exception as e:
+                swallowed("render_worker")
+                print(f"Err {t}: {e}")
+                continue
+            await rendered.put((t, result, charts))
+    
+    async def fragment_worker():
+        while (job := await rendered.get()) is not None:
+            t, result, charts = job
+            try:
+                results.append(build_ticker_fragment(t, result, charts, app_data_dict))
+            except Exception as e:
+                swallowed("fragment_worker")
+                print(f"Err {t}: {e}")
+    
+    try:
+        with span("stage.pipeline"):
+            await asyncio.gather(
+                _run_stage([fetch_worker() for _ in range(FETCH_WORKERS)], fetched, consumers=ANALYZE_WORKERS),
+                _run_stage([analyze_worker() for _ in range(ANALYZE_WORKERS)], analyzed),
+                _run_stage([render_worker()], rendered),
+                fragment_worker(),
+            )
+    finally:
+        render_pool.shutdown(wait=False)
+    
+    print(f"🏆 Pipeline Complete! Processed {len(results)} tickers.")
+    return results
+
+# ==================== 21. Main Execution ====================
+def update_history(processed_results, corr=None):
     history = load_history()
     today_str = datetime.now().strftime('%Y-%m-%d')
-    yesterday_str = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
-    day_before_str = (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d')
-
     top_5_today = []
-    for r in processed_results[:5]:
-        top_5_today.append({"ticker": r['ticker'], "score": r['score'], "sector": r['sector']})
+    for r in diversified_top(processed_results, corr):
+        top_5_today.append({"ticker": r.ticker, "score": r.score, "sector": r.sector})
     history[today_str] = top_5_today
     save_history(history)
     print(f"✅ History saved for {today_str}")
 
-    yesterday_picks = history.get(yesterday_str, [])
-    day_before_picks = history.get(day_before_str, [])
+def save_results(processed_results, weekly_news_html, market_status, market_text, sector_stats=None):
+    """Persist the run so `render` / `publish` can work without re-fetching anything"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(RESULTS_FILE, "w", encoding="utf-8") as f:
+            json.dump({"chart_mode": CHART_MODE, "news_html": weekly_news_html,
+                       "market_status": market_status, "market_text": market_text, "sectors": sector_stats or {},
+                       "results": [asdict(r) for r in processed_results]}, f)
+    except Exception as e:
+        swallowed("save_results")
+        print(f"❌ Failed to save results: {e}")
+
+def load_results():
+    with open(RESULTS_FILE, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    saved['results'] = [TickerResult(**r) for r in saved['results']]
+    return saved
 
-    # Discord
-    send_discord_alert(processed_results)
+@timed("stage.site")
+def build_site(APP_DATA, processed_results, weekly_news_html, market_status, market_text, sector_stats=None):
+    # 🔥 FIX 2: Define market_color properly
+    market_color = "#10b981" if market_status == "BULLISH" else ("#ef4444" if market_status == "BEARISH" else "#fbbf24")
+    
+    # History
+    history = load_history()
+    today_str = datetime.now().strftime('%Y-%m-%d')
+    yesterday_str = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    day_before_str = (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d')
 
-    # HTML Generation
-    top_5_html = generate_ticker_grid(top_5_today, "🏆 Today's Top 5")
-    yesterday_html = generate_ticker_grid(yesterday_picks, f"🥈 Yesterday's Picks ({yesterday_str})", "top-card")
-    day_before_html = generate_ticker_grid(day_before_picks, f"🥉 Day Before's Picks ({day_before_str})", "top-card")
+    top_5_today = history.get(today_str, [])
+    yesterday_picks = history.get(yesterday_str, [])
+    day_before_picks = history.get(day_before_str, [])
 
     sector_groups = {}
     for item in processed_results:
-        sec = item['sector']
+        sec = item.sector
         if sec not in sector_groups: sector_groups[sec] = []
         sector_groups[sec].append(item)
-        
-    sector_html_blocks = ""
-    for sec_name, items in sector_groups.items():
-        items.sort(key=lambda x: x['score'], reverse=True)
-        cards = ""
-        for item in items:
-            t = item['ticker']
-            if t not in APP_DATA: continue
-            d = APP_DATA[t]
-            rvol_val = d['rvol']
-            rvol_html = f"<span style='color:{'#f472b6' if rvol_val > 1.5 else ('#fbbf24' if rvol_val > 1.2 else '#64748b')};font-size:0.8rem'>Vol {rvol_val:.1f}x{' 🔥' if rvol_val > 1.5 else (' ⚡' if rvol_val > 1.2 else '')}</span>"
-            
-            badge_html = f"<span class='badge b-wait' style='font-size:0.65rem'>{d['wait_reason']}</span>" if d['signal'] == 'WAIT' else "<span class='badge b-long'>LONG</span>"
-            
-            earn_badge = ""
-            if item['earn']:
-                earn_badge = f"<span style='color:#ef4444;font-weight:bold;font-size:0.7rem;margin-right:5px;'>{item['earn']}</span>"
+    # Strongest sectors (mean RS rank) first
+    sector_stats = sector_stats or {}
+    sector_groups = dict(sorted(sector_groups.items(), key=lambda kv: -(sector_stats.get(kv[0], {}).get('rs') or -1)))
 
-            cards += f"<div class='card' onclick=\"openModal('{t}')\"><div class='head'><div><div class='code'>{t}</div></div><div style='text-align:right'>{badge_html}</div></div><div style='display:flex;justify-content:space-between;align-items:center;margin-top:5px'><span>{earn_badge}<span style='font-size:0.8rem;color:{('#10b981' if d['score']>=85 else '#3b82f6')}'>Score {d['score']}</span></span>{rvol_html}</div></div>"
-        sector_html_blocks += f"<h3 class='sector-title'>{sec_name}</h3><div class='grid'>{cards}</div>"
+    # Modal payloads go to per-ticker shards fetched on demand by openModal()
+    build_id = datetime.now().strftime('%Y%m%d%H%M%S')
+    write_data_shards(APP_DATA, processed_results, build_id)
 
-    json_data = json.dumps(APP_DATA)
-    
-    # f-string HTML generation. Note double curly braces for CSS/JS
-    final_html = f"""<!DOCTYPE html>
-    <html lang="en"><head><meta charset="utf-8"><meta name="viewport" content="width=device-width,initial-scale=1"><link rel="icon" href="https://cdn-icons-png.flaticon.com/512/3310/3310624.png"><title>DailyDip Pro</title>
-    <style>:root {{ --bg:#0f172a; --card:#1e293b; --text:#f8fafc; --acc:#3b82f6; --g:#10b981; --r:#ef4444; --y:#fbbf24; }} body {{ background:var(--bg); color:var(--text); font-family:sans-serif; margin:0; padding:10px; }} .tabs {{ display:flex; gap:10px; overflow-x:auto; border-bottom:1px solid #333; padding-bottom:10px; }} .tab {{ padding:8px 16px; background:#334155; border-radius:6px; cursor:pointer; font-weight:bold; white-space:nowrap; }} .tab.active {{ background:var(--acc); }} .content {{ display:none; }} .content.active {{ display:block; }} .grid {{ display:grid; grid-template-columns:repeat(auto-fill,minmax(160px,1fr)); gap:12px; }} .card {{ background:rgba(30,41,59,0.7); backdrop-filter:blur(10px); border:1px solid #333; border-radius:12px; padding:12px; cursor:pointer; }} .top-grid {{ display:grid; grid-template-columns:repeat(5, 1fr); gap:10px; margin-bottom:20px; overflow-x:auto; }} .top-card {{ text-align:center; min-width:100px; }} 
-    .modal {{ display:none; position:fixed; top:0; left:0; width:100%; height:100%; background:rgba(0,0,0,0.85); z-index:99; justify-content:center; overflow-y:auto; padding:10px; backdrop-filter: blur(5px); }} 
-    .m-content {{ background:#1e293b; width:100%; max-width:600px; padding:20px; margin-top:40px; border-radius:16px; border: 1px solid #334155; box-shadow: 0 20px 25px -5px rgba(0, 0, 0, 0.5); }} 
-    
-    #chart-d, #chart-h {{ width: 100%; min-height: 300px; background: #1e293b; display: flex; align-items: center; justify-content: center; }}
-    #chart-d img, #chart-h img {{ width: 100% !important; height: auto !important; display: block; border-radius: 8px; }}
-
-    .sector-title {{ border-left:4px solid var(--acc); padding-left:10px; margin:20px 0 10px; }} table {{ width:100%; border-collapse:collapse; }} td, th {{ padding:8px; border-bottom:1px solid #333; text-align:left; }} .badge {{ padding:4px 8px; border-radius:6px; font-weight:bold; font-size:0.75rem; }} .b-long {{ color:var(--g); border:1px solid var(--g); background:rgba(16,185,129,0.2); }} .b-wait {{ color:#94a3b8; border:1px solid #555; }} .market-bar {{ background:#1e293b; padding:10px; border-radius:8px; margin-bottom:20px; display:flex; gap:10px; border:1px solid #333; }} 
-    .news-card {{ background:var(--card); padding:15px; border-radius:8px; border:1px solid #333; margin-bottom:10px; }}
-    .news-title {{ font-size:1rem; font-weight:bold; color:var(--text); text-decoration:none; display:block; margin-top:5px; }}
-    .news-meta {{ font-size:0.75rem; color:#94a3b8; display:flex; justify-content:space-between; }}
-    @media (max-width: 600px) {{ .top-grid {{ grid-template-columns: repeat(auto-fill, minmax(100px, 1fr)); }} }}</style></head>
-    <body>
-    <div class="tradingview-widget-container" style="margin-bottom:15px">
-      <div class="tradingview-widget-container__widget"></div>
-      <script type="text/javascript" src="https://s3.tradingview.com/external-embedding/embed-widget-ticker-tape.js" async>
-      {{
-      "symbols": [{{"proName": "FOREXCOM:SPXUSD", "title": "S&P 500"}},{{"proName": "FOREXCOM:NSXUSD", "title": "US 100"}},{{"proName": "FX_IDC:EURUSD", "title": "EUR/USD"}},{{"proName": "BITSTAMP:BTCUSD", "title": "Bitcoin"}},{{"proName": "BITSTAMP:ETHUSD", "title": "Ethereum"}}],
-      "showSymbolLogo": true, "colorTheme": "dark", "isTransparent": false, "displayMode": "adaptive", "locale": "en"
-      }}
-      </script>
-    </div>
-    <div class="market-bar" style="border-left:4px solid {market_color}"><div>{ "🟢" if market_status=="BULLISH" else "🔴" }</div><div><b>Market: {market_status}</b><div style="font-size:0.8rem;color:#94a3b8">{market_text}</div></div></div>
-    
-    <div class="macro-grid" style="display:grid; grid-template-columns: repeat(4, 1fr); gap:10px; margin-bottom:15px; height: 120px;">
-        <div class="tradingview-widget-container"><div class="tradingview-widget-container__widget"></div><script type="text/javascript" src="https://s3.tradingview.com/external-embedding/embed-widget-mini-symbol-overview.js" async>{{"symbol": "CBOE:VIX","width": "100%","height": "100%","locale": "en","dateRange": "1M","colorTheme": "dark","isTransparent": true,"autosize": true,"largeChartUrl": ""}}</script></div>
-        <div class="tradingview-widget-container"><div class="tradingview-widget-container__widget"></div><script type="text/javascript" src="https://s3.tradingview.com/external-embedding/embed-widget-mini-symbol-overview.js" async>{{"symbol": "BINANCE:BTCUSDT","width": "100%","height": "100%","locale": "en","dateRange": "1M","colorTheme": "dark","isTransparent": true,"autosize": true,"largeChartUrl": ""}}</script></div>
-        <div class="tradingview-widget-container"><div class="tradingview-widget-container__widget"></div><script type="text/javascript" src="https://s3.tradingview.com/external-embedding/embed-widget-mini-symbol-overview.js" async>{{"symbol": "TVC:DXY","width": "100%","height": "100%","locale": "en","dateRange": "1M","colorTheme": "dark","isTransparent": true,"autosize": true,"largeChartUrl": ""}}</script></div>
-        <div class="tradingview-widget-container"><div class="tradingview-widget-container__widget"></div><script type="text/javascript" src="https://s3.tradingview.com/external-embedding/embed-widget-mini-symbol-overview.js" async>{{"symbol": "TVC:US10Y","width": "100%","height": "100%","locale": "en","dateRange": "1M","colorTheme": "dark","isTransparent": true,"autosize": true,"largeChartUrl": ""}}</script></div>
-    </div>
-
-    {top_5_html}
-    {yesterday_html}
-    {day_before_html}
-
-    <div class="tabs"><div class="tab active" onclick="setTab('overview',this)">📊 Sectors</div><div class="tab" onclick="setTab('news',this)">📰 News</div></div>
+    # HTML Generation: fragments are streamed straight into index.html
+    with open("index.html", "w", encoding="utf-8") as out:
+        out.write(tpl('page_start').substitute(
+            css_href=static_href("style.css"), market_color=market_color,
+            market_icon="🟢" if market_status == "BULLISH" else "🔴",
+            market_status=market_status, market_text=market_text))
+        write_ticker_grid(out, top_5_today, "🏆 Today's Top 5")
+        write_ticker_grid(out, yesterday_picks, f"🥈 Yesterday's Picks ({yesterday_str})", "top-card")
+        write_ticker_grid(out, day_before_picks, f"🥉 Day Before's Picks ({day_before_str})", "top-card")
+        out.write(tpl('tabs_start').template)
+        write_sector_blocks(out, sector_groups, APP_DATA, sector_stats)
+        out.write(tpl('page_mid').substitute(news_html=weekly_news_html, updated=datetime.now().strftime('%Y-%m-%d %H:%M UTC')))
+        out.write(tpl('modal').template)
+        out.write(tpl('page_end').substitute(build=build_id, js_href=static_href("app.js"), chart_js_href=static_href("chart.js")))
+    for path in ["index.html"] + [os.path.join(STATIC_DIR, name) for name in ("style.css", "app.js", "chart.js")]:
+        precompress(path)
+    print("✅ index.html generated!")
+
+async def run_async():
+    # News + market check run alongside the ticker stream instead of before it
+    news_task = asyncio.create_task(asyncio.to_thread(get_polygon_news))
+    market_task = asyncio.create_task(asyncio.to_thread(get_market_condition))
     
-    <div id="overview" class="content active">
-        {sector_html_blocks if sector_html_blocks else "<div style='text-align:center;padding:30px;color:#666'>Market is quiet. No high-conviction setups found today 🐻</div>"}
-        
-        <h3 style="margin-top:40px; border-bottom:1px solid #333; padding-bottom:10px;">📅 Economic Calendar</h3>
-        <div class="tradingview-widget-container" style="height:400px">
-          <div class="tradingview-widget-container__widget"></div>
-          <script type="text/javascript" src="https://s3.tradingview.com/external-embedding/embed-widget-events.js" async>
-          {{
-          "colorTheme": "dark", "isTransparent": true, "width": "100%", "height": "100%", "locale": "en", "importanceFilter": "-1,0,1", "currencyFilter": "USD"
-          }}
-          </script>
-        </div>
-        </div>
-
-    <div id="news" class="content">{weekly_news_html}</div>
-    <div style="text-align:center;color:#666;margin-top:30px;font-size:0.8rem">Updated: {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}</div>
+    APP_DATA = {}
+    returns = {}
+    processed_results = await run_pipeline(APP_DATA, market_task, returns)
+    processed_results.sort(key=lambda x: x.score, reverse=True)
+    xs = cross_sectional_strength(returns, {r.ticker: r.sector for r in processed_results})
+    for r in processed_results:
+        r.rs, r.rs_sector = xs['rs'].get(r.ticker), xs['rs_sector'].get(r.ticker)
     
-    <div id="modal" class="modal" onclick="this.style.display='none'">
-        <div class="m-content" onclick="event.stopPropagation()">
-            <div style="display:flex;justify-content:space-between;margin-bottom:15px;align-items:center;">
-                <h2 id="m-ticker" style="margin:0; font-size:2rem; font-weight:800;"></h2>
-                <div id="btn-area"></div>
-            </div>
-            <div id="m-deploy"></div>
-            <div style="margin-top:20px;">
-                <div style="font-weight:bold;color:#cbd5e1;margin-bottom:5px;">Daily SMC</div>
-                <div id="chart-d"></div>
-            </div>
-            <div style="margin-top:15px;">
-                <div style="font-weight:bold;color:#cbd5e1;margin-bottom:5px;">Hourly Entry</div>
-                <div id="chart-h"></div>
-            </div>
-            <button onclick="document.getElementById('modal').style.display='none'" style="width:100%;padding:15px;background:#334155;border:none;color:white;border-radius:8px;margin-top:20px;font-weight:bold;cursor:pointer;">Close</button>
-        </div>
-    </div>
-
-    <script>
-    const DATA={json_data};
-    function setTab(id,el){{document.querySelectorAll('.content').forEach(c=>c.classList.remove('active'));document.querySelectorAll('.tab').forEach(t=>t.classList.remove('active'));document.getElementById(id).classList.add('active');el.classList.add('active');}}
+    # Discord goes out while the site is being built
+    discord_task = asyncio.create_task(asyncio.to_thread(send_discord_alert, processed_results))
+    weekly_news_html = await news_task
+    market_status, market_text, _ = await market_task
+    save_results(processed_results, weekly_news_html, market_status, market_text, xs['sectors'])
+    update_history(processed_results, xs['corr'])
+    await asyncio.to_thread(build_site, APP_DATA, processed_results, weekly_news_html, market_status, market_text, xs['sectors'])
+    await discord_task
+
+def main():
+    print("🚀 Starting Super Screener (SMC V2 Optimized)...")
+    started = time.time()
+    try:
+        with span("run.total"):
+            asyncio.run(run_async())
+    finally:
+        write_run_report(started=started)
+
+# ==================== 22. Intraday Polling ====================
+# `main.py poll` re-checks the candidates every POLL_INTERVAL seconds. Each ticker keeps an
+# IndicatorState (persisted in .cache/poll_state.json), and only tickers whose latest hourly
+# bar changed get their daily bar revised and are re-scored.
+POLL_INTERVAL = 300
+POLL_STATE_FILE = os.path.join(CACHE_DIR, "poll_state.json")
+
+def hourly_to_daily_bar(df_h):
+    """The current session's daily bar, built from its hourly bars"""
+    if df_h is None or df_h.empty:
+        return None
+    last = df_h.index[-1]
+    day = df_h[df_h.index.normalize() == last.normalize()]
+    return {"hour": str(last), "date": last.strftime('%Y-%m-%d'),
+            "Open": float(day['Open'].iloc[0]), "High": float(day['High'].max()), "Low": float(day['Low'].min()),
+            "Close": float(day['Close'].iloc[-1]), "Volume": float(day['Volume'].sum())}
+
+def upsert_daily_bar(df, bar):
+    """Revise the last row when it is the same session, append a new row otherwise (in place)"""
+    cols = ['Open', 'High', 'Low', 'Close', 'Volume']
+    values = [bar[c] for c in cols]
+    if len(df) and df.index[-1].strftime('%Y-%m-%d') == bar['date']:
+        df.loc[df.index[-1], cols] = values
+    else:
+        ts = pd.Timestamp(bar['date'])
+        if df.index.tz is not None:
+            ts = ts.tz_localize(df.index.tz)
+        df.loc[ts, cols] = values
+    return df
+
+class YahooBarSource:
+    """Live bars: the full inputs once, then today's hourly bars on every poll"""
+    def inputs(self, t):
+        return fetch_ticker_inputs(t)
+
+    def latest_bar(self, t):
+        return hourly_to_daily_bar(fetch_data_safe(t, "1d", "1h"))
+
+    def market_bonus(self):
+        return get_market_condition()[2]
+
+    def advance(self):
+        return True
+
+class ReplayBarSource:
+    """Offline bars for testing the poll loop. <dir>/<T>.1d.csv seeds the daily history and
+    <dir>/<T>.1h.csv is revealed one hourly bar per poll."""
+    def __init__(self, directory, start=1):
+        self.directory = directory
+        self.cursor = start
+        self.hourly = {}
+
+    def _csv(self, t, interval):
+        path = os.path.join(self.directory, f"{t}.{interval}.csv")
+        if not os.path.exists(path):
+            return None
+        df = pd.read_csv(path, index_col=0)
+        df.index = pd.to_datetime(df.index, utc=True).tz_convert("America/New_York")
+        return df
+
+    def inputs(self, t):
+        df_d, df_h = self._csv(t, "1d"), self._csv(t, "1h")
+        if df_d is None or df_h is None:
+            return None
+        self.hourly[t] = df_h
+        return {"df_d": df_d, "df_h": df_h, "mtf_frames": (None, None), "earn": "", "sector": "", "news": []}
+
+    def latest_bar(self, t):
+        df_h = self.hourly[t]
+        return hourly_to_daily_bar(df_h.iloc[max(0, self.cursor - 8):self.cursor])
+
+    def market_bonus(self):
+        return 0
+
+    def advance(self):
+        self.cursor += 1
+        return any(self.cursor <= len(df) for df in self.hourly.values())
+
+def load_poll_state():
+    try:
+        with open(POLL_STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_poll_state(states, last_hour):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(POLL_STATE_FILE, "w", encoding="utf-8") as f:
+            json.dump({t: {"hour": last_hour[t], "indicators": s.to_dict()} for t, s in states.items()}, f)
+    except Exception as e:
+        swallowed("save_poll_state")
+        print(f"❌ Failed to save poll state: {e}")
+
+def poll_loop(tickers, source, interval=POLL_INTERVAL, iterations=None, alert=False):
+    saved = load_poll_state()
+    market_bonus = source.market_bonus()
+    inputs, states, last_hour, results = {}, {}, {}, {}
+    for t in tickers:
+        inp = source.inputs(t)
+        if inp is None:
+            print(f"❌ {t}: not enough data")
+            continue
+        inputs[t] = inp
+        entry = saved.get(t)
+        state = IndicatorState.from_dict(entry['indicators']) if entry else None
+        # A saved state only carries over if it ends on the same session as the fresh daily frame
+        if state is None or state.last_ts != inp['df_d'].index[-1].strftime('%Y-%m-%d'):
+            state, entry = IndicatorState.from_frame(inp['df_d']), None
+        states[t] = state
+        last_hour[t] = entry['hour'] if entry else None
+    print(f"⏱️ Polling {len(inputs)} tickers every {interval}s")
     
-    function updateCalculator(entry, sl) {{
-        const cap = parseFloat(document.getElementById('calc-capital').value) || 0;
-        const risk = parseFloat(document.getElementById('calc-risk').value) || 0;
-        const resultEl = document.getElementById('calc-result');
-        localStorage.setItem('user_capital', cap);
-        localStorage.setItem('user_risk', risk);
-        if (cap > 0 && risk > 0 && entry > 0 && sl > 0 && entry > sl) {{
-            const riskAmount = cap * (risk / 100);
-            const riskPerShare = entry - sl;
-            const shares = Math.floor(riskAmount / riskPerShare);
-            resultEl.innerText = shares + " Shares";
-            resultEl.style.color = "#fbbf24";
-        }} else {{
-            resultEl.innerText = "---";
-            resultEl.style.color = "#64748b";
-        }}
-    }}
-
-    function openModal(t){{
-        const d=DATA[t];if(!d)return;
-        document.getElementById('modal').style.display='flex';
-        document.getElementById('m-ticker').innerText=t;
-        document.getElementById('m-deploy').innerHTML=d.deploy;
-        document.getElementById('chart-d').innerHTML='<img src="'+d.img_d+'" style="width:100%; display:block;">';
-        document.getElementById('chart-h').innerHTML='<img src="'+d.img_h+'" style="width:100%; display:block;">';
-        
-        const btnArea=document.getElementById('btn-area'); btnArea.innerHTML='';
-        const tvBtn=document.createElement('button'); tvBtn.innerText='📈 Chart';
-        tvBtn.style.cssText='background:#2563eb;border:none;color:white;padding:8px 16px;border-radius:6px;font-weight:bold;cursor:pointer;box-shadow:0 2px 4px rgba(0,0,0,0.2);';
-        
-        tvBtn.onclick = function() {{
-            const currentTicker = document.getElementById('m-ticker').innerText;
-            const isMobile = /iPhone|iPad|iPod|Android/i.test(navigator.userAgent);
-            
-            if (isMobile) {{
-                window.location.href = 'tradingview://chart?symbol=' + currentTicker;
-                setTimeout(() => {{
-                    window.location.href = 'https://www.tradingview.com/chart/?symbol=' + currentTicker;
-                }}, 1500);
-            }} else {{
-                window.open('https://www.tradingview.com/chart/?symbol=' + currentTicker, '_blank');
-            }}
-        }};
-        btnArea.appendChild(tvBtn);
-
-        if (d.signal === "LONG") {{
-            const capInput = document.getElementById('calc-capital');
-            const riskInput = document.getElementById('calc-risk');
-            capInput.value = localStorage.getItem('user_capital') || '';
-            riskInput.value = localStorage.getItem('user_risk') || '1.5';
-            const runCalc = () => updateCalculator(d.data.entry, d.data.sl);
-            capInput.oninput = runCalc;
-            riskInput.oninput = runCalc;
-            runCalc();
-        }}
-    }}
-    </script></body></html>"""
+    polls = 0
+    while inputs:
+        changed = []
+        with span("poll.iteration"):
+            for t in inputs:
+                bar = source.latest_bar(t)
+                if bar is None or bar['hour'] == last_hour[t]:
+                    count("poll.unchanged")
+                    continue
+                last_hour[t] = bar['hour']
+                upsert_daily_bar(inputs[t]['df_d'], bar)
+                states[t].update(bar['date'], bar['Close'], bar['Volume'])
+                try:
+                    results[t] = analyze_ticker(t, inputs[t], market_bonus, indicators=states[t].as_indicators())
+                except Exception as e:
+                    swallowed("poll_loop")
+                    print(f"Err {t}: {e}")
+                    continue
+                count("poll.rescored")
+                changed.append(results[t])
+        
+        stamp = datetime.now().strftime('%H:%M:%S')
+        for r in sorted(changed, key=lambda x: x.score, reverse=True):
+            print(f"[{stamp}] {r.ticker:<6} {r.signal:<4} Score {r.score:<4} Price ${r.price:.2f}  Entry ${r.entry:.2f}  SL ${r.sl:.2f}")
+        if not changed:
+            print(f"[{stamp}] no new bars")
+        save_poll_state(states, last_hour)
+        if alert and changed:
+            send_discord_alert(sorted(results.values(), key=lambda x: x.score, reverse=True))
+        
+        polls += 1
+        if (iterations and polls >= iterations) or not source.advance():
+            break
+        time.sleep(interval)
+    return results
+
+# ==================== 23. CLI ====================
+def cmd_run(args):
+    main()
+
+def cmd_screen(args):
+    candidates = auto_select_candidates()
+    for c in candidates:
+        print(f"{c['ticker']:<6} {c['sector']}")
+
+def cmd_analyze(args):
+    _, market_text, market_bonus = get_market_condition()
+    print(f"🌍 {market_text} ({market_bonus:+d})")
+    for t in [t.upper() for t in args.tickers]:
+        inputs = fetch_ticker_inputs(t)
+        if inputs is None:
+            print(f"❌ {t}: not enough data")
+            continue
+        r = analyze_ticker(t, inputs, market_bonus)
+        status = r.signal if r.signal == "LONG" else f"WAIT ({r.wait_reason})"
+        print(f"\n{t}  {status}  Score {r.score}  |  Price ${r.price:.2f}  Entry ${r.entry:.2f}  SL ${r.sl:.2f}  TP ${r.tp:.2f}  R:R {r.rr:.1f}  Vol {r.rvol:.1f}x")
+        for reason in r.reasons:
+            print(f"   • {reason}")
+        if r.earn:
+            print(f"   💣 {r.earn}")
+
+def cmd_render(args):
+    global CHART_MODE
+    try:
+        saved = load_results()
+    except (OSError, ValueError) as e:
+        print(f"❌ No saved results to render ({e}). Run `python main.py run` first.")
+        return 1
+    CHART_MODE = saved['chart_mode']  # Shards must match the payloads that were saved
+    results = saved['results']
+    build_site({r.ticker: r for r in results}, results, saved['news_html'], saved['market_status'], saved['market_text'], saved.get('sectors'))
+
+def cmd_publish(args):
+    try:
+        saved = load_results()
+    except (OSError, ValueError) as e:
+        print(f"❌ No saved results to publish ({e}). Run `python main.py run` first.")
+        return 1
+    send_discord_alert(saved['results'], force=args.force)
+
+def cmd_poll(args):
+    tickers = [t.upper() for t in args.tickers]
+    if not tickers:
+        try:
+            tickers = [r.ticker for r in load_results()['results']]
+        except (OSError, ValueError):
+            print("❌ No tickers given and no saved run to take them from.")
+            return 1
+    source = ReplayBarSource(args.replay) if args.replay else YahooBarSource()
+    interval = args.interval if args.interval is not None else (0 if args.replay else POLL_INTERVAL)
+    started = time.time()
+    try:
+        poll_loop(tickers, source, interval, args.iterations, args.alert)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        write_run_report(started=started)
+
+def cmd_history(args):
+    history = load_history()
+    for day in sorted(history, reverse=True)[:args.days]:
+        picks = ", ".join(f"{p['ticker']} ({p.get('score', 0)})" for p in history[day]) or "-"
+        print(f"{day}  {picks}")
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py", description="Daily Dip screener. No command = full run.")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("run", help="screen, analyze, render and publish (default)")
+    sub.add_parser("screen", help="run the universe screener and list candidates")
+    p = sub.add_parser("analyze", help="analyze specific tickers and print their setup")
+    p.add_argument("tickers", nargs="+")
+    sub.add_parser("render", help="rebuild index.html + data shards from the last saved run")
+    p = sub.add_parser("publish", help="send Discord alerts for the last saved run")
+    p.add_argument("--force", action="store_true", help="resend picks already in the alert ledger")
+    p = sub.add_parser("poll", help="intraday loop: re-score tickers whenever their hourly bar changes")
+    p.add_argument("tickers", nargs="*", help="default: the tickers of the last saved run")
+    p.add_argument("--interval", type=float, help=f"seconds between polls (default {POLL_INTERVAL}, 0 with --replay)")
+    p.add_argument("--iterations", type=int, help="stop after this many polls")
+    p.add_argument("--replay", metavar="DIR", help="replay <T>.1d.csv / <T>.1h.csv bars from DIR instead of Yahoo")
+    p.add_argument("--alert", action="store_true", help="send Discord alerts for new LONG setups")
+    p = sub.add_parser("history", help="show the saved top picks")
+    p.add_argument("-n", "--days", type=int, default=5)
+    args = parser.parse_args(argv)
     
-    with open("index.html", "w", encoding="utf-8") as f: 
-        f.write(final_html)
-    print("✅ index.html generated!")
+    handlers = {"run": cmd_run, "screen": cmd_screen, "analyze": cmd_analyze,
+                "render": cmd_render, "publish": cmd_publish, "poll": cmd_poll, "history": cmd_history}
+    return handlers[args.cmd or "run"](args) or 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(cli())
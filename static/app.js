@@ -0,0 +1,109 @@
+function setTab(id,el){document.querySelectorAll('.content').forEach(c=>c.classList.remove('active'));document.querySelectorAll('.tab').forEach(t=>t.classList.remove('active'));document.getElementById(id).classList.add('active');el.classList.add('active');}
+
+function updateCalculator(entry, sl) {
+    const cap = parseFloat(document.getElementById('calc-capital').value) || 0;
+    const risk = parseFloat(document.getElementById('calc-risk').value) || 0;
+    const resultEl = document.getElementById('calc-result');
+    localStorage.setItem('user_capital', cap);
+    localStorage.setItem('user_risk', risk);
+    if (cap > 0 && risk > 0 && entry > 0 && sl > 0 && entry > sl) {
+        const riskAmount = cap * (risk / 100);
+        const riskPerShare = entry - sl;
+        const shares = Math.floor(riskAmount / riskPerShare);
+        resultEl.innerText = shares + " Shares";
+        resultEl.style.color = "#fbbf24";
+    } else {
+        resultEl.innerText = "---";
+        resultEl.style.color = "#64748b";
+    }
+}
+
+// Modal data lives in data/t/<TICKER>.json, fetched on first open and cached per page view
+let INDEX = null;
+const SHARDS = {};
+
+function loadIndex(){
+    if (!INDEX) INDEX = fetch('data/index.json?v=' + BUILD).then(r => r.ok ? r.json() : {tickers: {}}).then(j => j.tickers).catch(() => { INDEX = null; return {}; });
+    return INDEX;
+}
+
+function loadShard(t){
+    if (!SHARDS[t]) {
+        SHARDS[t] = loadIndex().then(idx => {
+            const e = idx[t]; if (!e) return null;
+            return fetch('data/t/' + encodeURIComponent(t) + '.json?v=' + e.v).then(r => r.ok ? r.json() : null);
+        }).catch(() => null).then(d => { if (!d) delete SHARDS[t]; return d; });
+    }
+    return SHARDS[t];
+}
+
+function renderNews(el, news){
+    if (!news.length) return;
+    const head = document.createElement('div');
+    head.style.cssText = 'font-weight:bold;color:#cbd5e1;margin-bottom:5px;';
+    head.textContent = 'Latest News';
+    el.appendChild(head);
+    news.forEach(n => {
+        const card = document.createElement('div'); card.className = 'news-card';
+        const meta = document.createElement('div'); meta.className = 'news-meta';
+        const src = document.createElement('span'); src.className = 'news-source'; src.textContent = n.publisher;
+        const dt = document.createElement('span'); dt.className = 'news-date'; dt.textContent = n.published.slice(0, 10);
+        const a = document.createElement('a'); a.className = 'news-title'; a.href = n.url; a.target = '_blank'; a.rel = 'noopener'; a.textContent = n.title;
+        meta.append(src, dt); card.append(meta, a); el.appendChild(card);
+    });
+}
+
+async function openModal(t){
+    document.getElementById('modal').style.display='flex';
+    document.getElementById('m-ticker').innerText=t;
+    document.getElementById('m-deploy').innerHTML='<div style="padding:20px;text-align:center;color:#94a3b8">Loading...</div>';
+    document.getElementById('chart-d').innerHTML='';
+    document.getElementById('chart-h').innerHTML='';
+    document.getElementById('btn-area').innerHTML='';
+    document.getElementById('m-news').innerHTML='';
+    const d = await loadShard(t);
+    if (document.getElementById('m-ticker').innerText !== t) return; // another modal was opened meanwhile
+    if (!d) { document.getElementById('m-deploy').innerHTML='<div style="padding:20px;text-align:center;color:#94a3b8">No data for ' + t + ' today</div>'; return; }
+    document.getElementById('m-deploy').innerHTML=d.deploy;
+    // Canvas payloads when the site was built with CHART_MODE=canvas, PNG data URIs otherwise
+    if (d.chart_d) {
+        drawChart(document.getElementById('chart-d'), d.chart_d);
+        drawChart(document.getElementById('chart-h'), d.chart_h);
+    } else {
+        document.getElementById('chart-d').innerHTML='<img src="'+d.img_d+'" style="width:100%; display:block;">';
+        document.getElementById('chart-h').innerHTML='<img src="'+d.img_h+'" style="width:100%; display:block;">';
+    }
+    renderNews(document.getElementById('m-news'), d.news || []);
+    
+    const btnArea=document.getElementById('btn-area'); btnArea.innerHTML='';
+    const tvBtn=document.createElement('button'); tvBtn.innerText='📈 Chart';
+    tvBtn.style.cssText='background:#2563eb;border:none;color:white;padding:8px 16px;border-radius:6px;font-weight:bold;cursor:pointer;box-shadow:0 2px 4px rgba(0,0,0,0.2);';
+    
+    tvBtn.onclick = function() {
+        const currentTicker = document.getElementById('m-ticker').innerText;
+        const isMobile = /iPhone|iPad|iPod|Android/i.test(navigator.userAgent);
+        
+        if (isMobile) {
+            window.location.href = 'tradingview://chart?symbol=' + currentTicker;
+            setTimeout(() => {
+                window.location.href = 'https://www.tradingview.com/chart/?symbol=' + currentTicker;
+            }, 1500);
+        } else {
+            window.open('https://www.tradingview.com/chart/?symbol=' + currentTicker, '_blank');
+        }
+    };
+    btnArea.appendChild(tvBtn);
+
+    if (d.signal === "LONG") {
+        const capInput = document.getElementById('calc-capital');
+        const riskInput = document.getElementById('calc-risk');
+        capInput.value = localStorage.getItem('user_capital') || '';
+        riskInput.value = localStorage.getItem('user_risk') || '1.5';
+        const runCalc = () => updateCalculator(d.entry, d.sl);
+        capInput.oninput = runCalc;
+        riskInput.oninput = runCalc;
+        runCalc();
+    }
+}
+
+loadIndex();
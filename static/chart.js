@@ -0,0 +1,99 @@
+// Canvas renderer for the compact chart payloads written by build_chart_payload() in main.py.
+// Prices arrive as ints: price = p0 + q * n. Volume is scaled to 0..255.
+const CHART_COLORS = {bg:'#1e293b', grid:'#334155', up:'#22c55e', down:'#ef4444', vol:'#334155', ma:'#38bdf8', tp:'#22c55e', entry:'#3b82f6', sl:'#ef4444', text:'#ffffff'};
+
+function drawChart(el, c){
+    el.innerHTML = '';
+    const canvas = document.createElement('canvas');
+    el.appendChild(canvas);
+    const dpr = window.devicePixelRatio || 1;
+    const W = el.clientWidth || 560, H = Math.round(W * 0.6);
+    canvas.width = W * dpr; canvas.height = H * dpr;
+    canvas.style.width = W + 'px'; canvas.style.height = H + 'px';
+    canvas.style.borderRadius = '8px';
+    const ctx = canvas.getContext('2d');
+    ctx.scale(dpr, dpr);
+    ctx.fillStyle = CHART_COLORS.bg; ctx.fillRect(0, 0, W, H);
+
+    if (c.error) {
+        ctx.fillStyle = CHART_COLORS.text; ctx.font = '14px sans-serif'; ctx.textAlign = 'center';
+        ctx.fillText(c.error, W / 2, H / 2);
+        return;
+    }
+
+    const px = n => c.p0 + c.q * n;
+    const n = c.c.length;
+    const top = 30, bottom = 18, volH = Math.round((H - top - bottom) * 0.25), priceH = H - top - bottom - volH - 6;
+
+    // Price range covers the bars plus TP / Entry / SL
+    let lo = Math.min(px(Math.min(...c.l)), c.sl, c.entry), hi = Math.max(px(Math.max(...c.h)), c.tp, c.entry);
+    const pad = (hi - lo) * 0.04 || 1; lo -= pad; hi += pad;
+    const y = p => top + (hi - p) / (hi - lo) * priceH;
+    const step = W / n, bw = Math.max(1, step * 0.6);
+    const x = i => i * step + step / 2;
+
+    // Grid
+    ctx.strokeStyle = CHART_COLORS.grid; ctx.lineWidth = 1;
+    ctx.fillStyle = '#94a3b8'; ctx.font = '10px sans-serif'; ctx.textAlign = 'right';
+    for (let k = 0; k <= 4; k++) {
+        const p = lo + (hi - lo) * k / 4, yy = Math.round(y(p)) + 0.5;
+        ctx.beginPath(); ctx.moveTo(0, yy); ctx.lineTo(W, yy); ctx.stroke();
+        ctx.fillText(p.toFixed(2), W - 4, yy - 2);
+    }
+
+    // Risk / reward zones
+    if (!c.wait) {
+        ctx.fillStyle = 'rgba(34,197,94,0.08)'; ctx.fillRect(0, y(c.tp), W, y(c.entry) - y(c.tp));
+        ctx.fillStyle = 'rgba(239,68,68,0.08)'; ctx.fillRect(0, y(c.entry), W, y(c.sl) - y(c.entry));
+    }
+
+    // Candles + volume
+    const volTop = top + priceH + 6;
+    for (let i = 0; i < n; i++) {
+        const up = c.c[i] >= c.o[i], col = up ? CHART_COLORS.up : CHART_COLORS.down;
+        ctx.strokeStyle = col; ctx.fillStyle = col;
+        ctx.beginPath(); ctx.moveTo(x(i), y(px(c.h[i]))); ctx.lineTo(x(i), y(px(c.l[i]))); ctx.stroke();
+        const yo = y(px(c.o[i])), yc = y(px(c.c[i]));
+        ctx.fillRect(x(i) - bw / 2, Math.min(yo, yc), bw, Math.max(1, Math.abs(yc - yo)));
+        const vh = c.v[i] / 255 * volH;
+        ctx.fillStyle = CHART_COLORS.vol; ctx.fillRect(x(i) - bw / 2, volTop + volH - vh, bw, vh);
+    }
+
+    // MA50
+    ctx.strokeStyle = CHART_COLORS.ma; ctx.lineWidth = 1.2; ctx.beginPath();
+    let started = false;
+    c.ma.forEach((m, i) => {
+        if (m === null) return;
+        if (!started) { ctx.moveTo(x(i), y(px(m))); started = true; } else ctx.lineTo(x(i), y(px(m)));
+    });
+    ctx.stroke();
+
+    // Levels
+    ctx.lineWidth = 1.5; ctx.setLineDash(c.wait ? [2, 3] : []);
+    ctx.font = 'bold 10px sans-serif'; ctx.textAlign = 'left';
+    [['tp', ' TP', 'bottom'], ['entry', ' ENTRY', 'bottom'], ['sl', ' SL', 'top']].forEach(([k, label, base]) => {
+        const yy = y(c[k]);
+        ctx.strokeStyle = CHART_COLORS[k]; ctx.fillStyle = CHART_COLORS[k];
+        ctx.beginPath(); ctx.moveTo(0, yy); ctx.lineTo(W, yy); ctx.stroke();
+        ctx.textBaseline = base; ctx.fillText(label, 2, yy);
+    });
+    ctx.setLineDash([]); ctx.textBaseline = 'alphabetic';
+
+    // Sweep annotation at the window low
+    if (c.sweep) {
+        const major = c.sweep === 'MAJOR', col = major ? '#ef4444' : '#fbbf24';
+        let li = 0; c.l.forEach((v, i) => { if (v < c.l[li]) li = i; });
+        const ax = x(li), ay = y(px(c.l[li]));
+        ctx.strokeStyle = col; ctx.fillStyle = col; ctx.lineWidth = 1.5;
+        ctx.beginPath(); ctx.moveTo(ax, ay + 18); ctx.lineTo(ax, ay + 3); ctx.stroke();
+        ctx.font = 'bold 11px sans-serif'; ctx.textAlign = 'center';
+        ctx.fillText(major ? '🌊 MAJOR SWEEP' : '💧 MINOR SWEEP', Math.min(Math.max(ax, 60), W - 60), Math.min(ay + 30, volTop - 2));
+    }
+
+    // Title + date range
+    ctx.fillStyle = CHART_COLORS.text; ctx.font = 'bold 14px sans-serif'; ctx.textAlign = 'center';
+    ctx.fillText(c.title, W / 2, 18);
+    ctx.fillStyle = '#64748b'; ctx.font = '10px sans-serif';
+    ctx.textAlign = 'left'; ctx.fillText(c.d[0], 2, H - 4);
+    ctx.textAlign = 'right'; ctx.fillText(c.d[1], W - 2, H - 4);
+}